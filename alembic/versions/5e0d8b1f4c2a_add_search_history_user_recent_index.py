@@ -0,0 +1,37 @@
+"""
+Revision ID: 5e0d8b1f4c2a
+Revises: ca83c5f7026e
+Create Date: 2026-10-18 11:03:52.640118
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "5e0d8b1f4c2a"
+down_revision: Union[str, None] = "ca83c5f7026e"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Composite index for "newest history of one user" and keyset pagination
+    op.create_index(
+        "ix_search_history_user_id_searched_at",
+        "search_history",
+        ["user_id", sa.text("searched_at DESC")],
+    )
+    # Its leading column makes the single-column user_id index redundant
+    op.drop_index("ix_search_history_user_id", table_name="search_history")
+
+
+def downgrade() -> None:
+    op.create_index(
+        "ix_search_history_user_id",
+        "search_history",
+        ["user_id"],
+    )
+    op.drop_index("ix_search_history_user_id_searched_at", table_name="search_history")
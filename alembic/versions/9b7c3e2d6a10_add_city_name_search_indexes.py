@@ -0,0 +1,43 @@
+"""
+Revision ID: 9b7c3e2d6a10
+Revises: 5e0d8b1f4c2a
+Create Date: 2026-10-18 11:47:09.215364
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "9b7c3e2d6a10"
+down_revision: Union[str, None] = "5e0d8b1f4c2a"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Trigram operator classes for substring (LIKE '%q%') matching
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    # Prefix matching: lower(city_name) LIKE 'q%' within one user's history
+    op.create_index(
+        "ix_search_history_user_id_city_name_pattern",
+        "search_history",
+        ["user_id", sa.text("lower(city_name) text_pattern_ops")],
+    )
+    # Substring matching: lower(city_name) LIKE '%q%'
+    op.create_index(
+        "ix_search_history_city_name_trgm",
+        "search_history",
+        [sa.text("lower(city_name) gin_trgm_ops")],
+        postgresql_using="gin",
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_search_history_city_name_trgm", table_name="search_history")
+    op.drop_index(
+        "ix_search_history_user_id_city_name_pattern", table_name="search_history"
+    )
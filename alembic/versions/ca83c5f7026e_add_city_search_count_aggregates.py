@@ -0,0 +1,73 @@
+"""
+Revision ID: ca83c5f7026e
+Revises: 2a26550b39e4
+Create Date: 2026-10-18 10:12:31.418207
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "ca83c5f7026e"
+down_revision: Union[str, None] = "2a26550b39e4"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 1) Global per-city search counts
+    op.create_table(
+        "city_search_counts",
+        sa.Column("city_name", sa.String(), primary_key=True, nullable=False),
+        sa.Column(
+            "search_count",
+            sa.Integer(),
+            server_default=sa.text("0"),
+            nullable=False,
+        ),
+    )
+
+    # 2) Per-user per-city search counts
+    op.create_table(
+        "user_city_search_counts",
+        sa.Column(
+            "user_id",
+            sa.Integer(),
+            sa.ForeignKey("users.id", ondelete="CASCADE"),
+            primary_key=True,
+            nullable=False,
+        ),
+        sa.Column("city_name", sa.String(), primary_key=True, nullable=False),
+        sa.Column(
+            "search_count",
+            sa.Integer(),
+            server_default=sa.text("0"),
+            nullable=False,
+        ),
+    )
+
+    # 3) Backfill both from the existing history
+    op.execute(
+        """
+        INSERT INTO city_search_counts (city_name, search_count)
+        SELECT city_name, count(*)
+        FROM search_history
+        GROUP BY city_name
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO user_city_search_counts (user_id, city_name, search_count)
+        SELECT user_id, city_name, count(*)
+        FROM search_history
+        GROUP BY user_id, city_name
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("user_city_search_counts")
+    op.drop_table("city_search_counts")
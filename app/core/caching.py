@@ -0,0 +1,85 @@
+import hashlib
+from typing import Callable
+
+from fastapi import Request, Response
+
+__all__ = [
+    "PRIVATE_NO_CACHE",
+    "cache_control",
+    "conditional_response",
+    "make_etag",
+    "not_modified",
+    "version_etag",
+]
+
+# For per-user responses: never stored by shared caches, always revalidated
+PRIVATE_NO_CACHE = "private, no-cache"
+
+
+def make_etag(body: bytes) -> str:
+    """Strong ETag for a response body."""
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def version_etag(*parts: object) -> str:
+    """
+    Strong ETag for whatever identifies a representation's version, so it is
+    known before the body is built.
+    """
+    return make_etag("|".join(map(str, parts)).encode())
+
+
+def cache_control(
+    max_age: int, stale_while_revalidate: int = 0, private: bool = False
+) -> str:
+    directives = ["private" if private else "public", f"max-age={max_age}"]
+    if stale_while_revalidate:
+        directives.append(f"stale-while-revalidate={stale_while_revalidate}")
+    return ", ".join(directives)
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    # If-None-Match uses the weak comparison function (RFC 9110, 13.1.2)
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def not_modified(request: Request, etag: str, cache_control: str) -> Response | None:
+    """
+    An empty 304 when the client already holds the representation tagged
+    ``etag`` (If-None-Match), else None; check before doing costly work.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(
+            status_code=304, headers={"ETag": etag, "Cache-Control": cache_control}
+        )
+    return None
+
+
+def conditional_response(
+    request: Request,
+    body: bytes | Callable[[], bytes],
+    cache_control: str,
+    media_type: str = "application/json",
+    etag: str | None = None,
+) -> Response:
+    """
+    Respond with ``body`` and its ETag, or with an empty 304 when the client
+    already holds that representation (If-None-Match).
+
+    Given an ``etag``, ``body`` may be a callable that builds the body; it is
+    only called when the client's copy is stale. Without one, the ETag is a
+    hash of ``body``.
+    """
+    if etag is None:
+        etag = make_etag(body)
+    response = not_modified(request, etag, cache_control)
+    if response is not None:
+        return response
+    if callable(body):
+        body = body()
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    return Response(content=body, media_type=media_type, headers=headers)
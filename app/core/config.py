@@ -1,3 +1,5 @@
+from importlib.util import find_spec
+
 from pydantic import PostgresDsn
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -14,5 +16,112 @@ class Settings(BaseSettings):
     )
     database_url: PostgresDsn
 
+    # Shared outbound HTTP client (Open-Meteo)
+    http_timeout: float = 5.0
+    http_connect_timeout: float = 3.0
+    http_max_connections: int = 100
+    http_max_keepalive_connections: int = 20
+    http_keepalive_expiry: float = 30.0
+    # HTTP/2 needs the h2 package (httpx[http2]), so it is off without it
+    http2: bool = find_spec("h2") is not None
+
+    # Parse and render JSON with orjson when it is installed
+    # (`poetry install -E fast-json`); the stdlib json module otherwise.
+    fast_json: bool = True
+
+    # Limiter shared by all Open-Meteo calls: a token bucket refilled at up to
+    # upstream_rate calls/s and at most upstream_max_concurrency calls in
+    # flight. 429s cut the rate by upstream_backoff and pause for their
+    # Retry-After (capped); each success adds upstream_rate_increase back.
+    # Calls wait up to upstream_queue_timeout seconds for a slot.
+    upstream_rate: float = 10.0
+    upstream_burst: int = 20
+    upstream_min_rate: float = 1.0
+    upstream_rate_increase: float = 0.1
+    upstream_backoff: float = 0.5
+    upstream_max_concurrency: int = 20
+    upstream_queue_timeout: float = 2.0
+    upstream_max_retry_after: float = 60.0
+
+    # Resilience around Open-Meteo calls. Network errors and 502/503/504 are
+    # retried up to upstream_retries times, sleeping with decorrelated jitter
+    # between the base and max delay. With upstream_hedge, a call still
+    # running after the upstream_hedge_quantile of recent latencies (once
+    # upstream_hedge_min_samples are known) gets a second, parallel request.
+    # upstream_breaker_threshold failed calls in a row open that API's
+    # circuit for upstream_breaker_reset seconds: calls then fail fast and
+    # cached (stale) forecasts and geocoding results are served instead.
+    upstream_retries: int = 2
+    upstream_retry_base_delay: float = 0.1
+    upstream_retry_max_delay: float = 1.0
+    upstream_hedge: bool = True
+    upstream_hedge_quantile: float = 0.95
+    upstream_hedge_min_samples: int = 20
+    upstream_hedge_min_delay: float = 0.05
+    upstream_latency_window: int = 200
+    upstream_breaker_threshold: int = 5
+    upstream_breaker_reset: float = 30.0
+
+    # Forecast cache, keyed by coordinates snapped to a grid (degrees)
+    forecast_cache_ttl: float = 900.0
+    forecast_cache_max_entries: int = 1024
+    forecast_cache_max_bytes: int = 32 * 1024 * 1024
+    forecast_cache_grid: float = 0.01
+    # How long past its TTL a forecast may still be served while it is
+    # refreshed in the background; older entries block on upstream (0 disables)
+    forecast_stale_ttl: float = 3600.0
+
+    # POST /api/weather/batch: upstream calls in flight per batch, and
+    # locations per multi-location Forecast API request
+    weather_batch_concurrency: int = 10
+    forecast_batch_locations: int = 50
+
+    # anon_uuid cookie -> users.id cache used by AuthMiddleware
+    user_cache_ttl: float = 600.0
+    user_cache_max_entries: int = 100_000
+    # Cookies without a users row yet; short-lived, as another worker may
+    # create the row at any time
+    unknown_cookie_cache_ttl: float = 5.0
+    unknown_cookie_cache_max_entries: int = 10_000
+
+    # Write-behind buffer for search history rows
+    history_batch_size: int = 500
+    history_flush_interval: float = 1.0
+    history_max_pending: int = 10_000
+    # A failed batch insert is retried this many times, waiting
+    # history_retry_delay seconds and doubling it each time, then dropped
+    history_flush_retries: int = 3
+    history_retry_delay: float = 0.5
+
+    # Seconds /api/suggest waits for geocoding before answering from history only
+    suggest_upstream_deadline: float = 0.8
+    # Seconds the WebSocket autocomplete waits before calling geocoding, so
+    # keystrokes superseded within that time never reach upstream
+    suggest_ws_debounce: float = 0.15
+
+    # Geocoding (autocomplete) cache
+    geocode_cache_ttl: float = 6 * 3600.0
+    geocode_cache_max_entries: int = 4096
+    # Open-Meteo only fuzzy-matches from 3 characters on, so shorter result
+    # sets are not supersets of longer queries and cannot be reused.
+    geocode_prefix_min_length: int = 3
+    # How long past its TTL a geocoding result may still be served when the
+    # geocoding API is failing (0 disables)
+    geocode_stale_ttl: float = 24 * 3600.0
+
+    # Cache-Control lifetimes for API responses (seconds)
+    stats_max_age: int = 60
+    suggest_max_age: int = 60
+    api_stale_while_revalidate: int = 600
+
+    # Rendered forecast-table fragments on the HTML page
+    fragment_cache_ttl: float = 900.0
+    fragment_cache_max_entries: int = 512
+
+    # Local gazetteer answered before the geocoding API: a GeoNames cities
+    # dump (e.g. cities15000.txt) or an index built from one with
+    # `python -m app.geo build-index`. Disabled when unset.
+    gazetteer_path: str | None = None
+
 
 settings = Settings()
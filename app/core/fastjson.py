@@ -0,0 +1,46 @@
+import json
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+from app.core.config import settings
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the fast-json extra
+    orjson = None
+
+__all__ = ["FastJSONResponse", "dumps", "loads", "using_orjson"]
+
+
+def using_orjson() -> bool:
+    return orjson is not None and settings.fast_json
+
+
+def loads(data: bytes | str) -> Any:
+    """Decode a JSON document, with orjson when available."""
+    if using_orjson():
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj: Any) -> bytes:
+    """
+    Encode to compact UTF-8 JSON, byte for byte what Starlette's JSONResponse
+    renders for the same plain-Python content.
+    """
+    if using_orjson():
+        return orjson.dumps(obj)
+    return json.dumps(
+        obj, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse rendered through ``dumps``; used as the API router's
+    default response class.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
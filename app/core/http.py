@@ -0,0 +1,47 @@
+import logging
+from importlib.util import find_spec
+
+import httpx
+from starlette.requests import HTTPConnection
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """
+    Build the application-scoped HTTP client used for all Open-Meteo calls.
+
+    Connections are pooled and kept alive between requests, so autocomplete
+    keystrokes and forecast lookups reuse existing TCP/TLS sessions.
+    """
+    return httpx.AsyncClient(
+        http2=_http2_enabled(),
+        timeout=httpx.Timeout(
+            settings.http_timeout, connect=settings.http_connect_timeout
+        ),
+        limits=httpx.Limits(
+            max_connections=settings.http_max_connections,
+            max_keepalive_connections=settings.http_max_keepalive_connections,
+            keepalive_expiry=settings.http_keepalive_expiry,
+        ),
+    )
+
+
+def _http2_enabled() -> bool:
+    if settings.http2 and find_spec("h2") is None:
+        logger.warning("HTTP2 is set but h2 is not installed; using HTTP/1.1")
+        return False
+    return settings.http2
+
+
+async def get_http_client(conn: HTTPConnection) -> httpx.AsyncClient | None:
+    """
+    Dependency that provides the shared HTTP client created in the app lifespan,
+    for both HTTP and WebSocket endpoints.
+
+    :return: the pooled client, or None when the app runs without its lifespan
+      (the services then fall back to a short-lived client per call).
+    """
+    return getattr(conn.app.state, "http_client", None)
@@ -0,0 +1,13 @@
+from .gazetteer import CityIndex, CityRecord, Gazetteer, normalize_name, read_geonames
+from .index import MappedGazetteer, build_index, load_gazetteer
+
+__all__ = [
+    "CityIndex",
+    "CityRecord",
+    "Gazetteer",
+    "MappedGazetteer",
+    "build_index",
+    "load_gazetteer",
+    "normalize_name",
+    "read_geonames",
+]
@@ -0,0 +1,34 @@
+"""
+Gazetteer tools::
+
+    python -m app.geo build-index cities15000.txt cities15000.idx
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+from app.geo.gazetteer import read_geonames
+from app.geo.index import build_index
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.geo")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser(
+        "build-index", help="compile a GeoNames cities dump into an index file"
+    )
+    build.add_argument("source", type=Path, help="e.g. cities15000.txt")
+    build.add_argument(
+        "output", type=Path, nargs="?", help="defaults to SOURCE with .idx suffix"
+    )
+    args = parser.parse_args(argv)
+
+    output = args.output or args.source.with_suffix(".idx")
+    count = build_index(read_geonames(args.source), output)
+    print(f"Wrote {count} cities to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
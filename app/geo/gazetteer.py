@@ -0,0 +1,233 @@
+import heapq
+import unicodedata
+from abc import ABC, abstractmethod
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Sequence
+
+from app.schemas.weather import City
+
+__all__ = [
+    "CityIndex",
+    "CityRecord",
+    "Gazetteer",
+    "normalize_name",
+    "read_geonames",
+]
+
+# Optional GeoNames side files looked up next to the cities dump
+ADMIN1_FILE = "admin1CodesASCII.txt"
+COUNTRY_FILE = "countryInfo.txt"
+
+
+def normalize_name(name: str) -> str:
+    """
+    Matching key for a city name: accents stripped, casefolded, single spaces.
+    """
+    decomposed = unicodedata.normalize("NFKD", name)
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(stripped.casefold().split())
+
+
+def city_keys(record: "CityRecord") -> set[str]:
+    """
+    Normalized keys a city is found under: its native and ASCII names.
+    """
+    return {
+        key
+        for key in (normalize_name(record.name), normalize_name(record.ascii_name))
+        if key
+    }
+
+
+class CityRecord(NamedTuple):
+    """
+    One city as read from a GeoNames dump.
+    """
+
+    name: str
+    ascii_name: str
+    country_code: str
+    country: str
+    admin1: str
+    latitude: float
+    longitude: float
+    population: int
+    timezone: str
+
+    def to_city(self) -> City:
+        return City(
+            name=self.name,
+            country=self.country or None,
+            country_code=self.country_code or None,
+            latitude=self.latitude,
+            longitude=self.longitude,
+            admin1=self.admin1 or None,
+            timezone=self.timezone or None,
+        )
+
+
+def _read_admin1(path: Path) -> Dict[str, str]:
+    names = {}
+    with path.open(encoding="utf-8") as f:
+        for line in f:
+            cols = line.rstrip("\n").split("\t")
+            if len(cols) >= 2:
+                names[cols[0]] = cols[1]
+    return names
+
+
+def _read_countries(path: Path) -> Dict[str, str]:
+    names = {}
+    with path.open(encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("#"):
+                continue
+            cols = line.rstrip("\n").split("\t")
+            if len(cols) >= 5:
+                names[cols[0]] = cols[4]
+    return names
+
+
+def read_geonames(path: str | Path) -> Iterator[CityRecord]:
+    """
+    Parse a GeoNames cities dump (e.g. cities15000.txt).
+
+    Country and admin1 names are filled in from countryInfo.txt and
+    admin1CodesASCII.txt when those files sit in the same directory.
+    """
+    path = Path(path)
+    admin1_path = path.with_name(ADMIN1_FILE)
+    country_path = path.with_name(COUNTRY_FILE)
+    admin1_names = _read_admin1(admin1_path) if admin1_path.exists() else {}
+    countries = _read_countries(country_path) if country_path.exists() else {}
+
+    with path.open(encoding="utf-8") as f:
+        for line in f:
+            cols = line.rstrip("\n").split("\t")
+            if len(cols) < 18:
+                continue
+            country_code = cols[8]
+            yield CityRecord(
+                name=cols[1],
+                ascii_name=cols[2],
+                country_code=country_code,
+                country=countries.get(country_code, ""),
+                admin1=admin1_names.get(f"{country_code}.{cols[10]}", ""),
+                latitude=float(cols[4]),
+                longitude=float(cols[5]),
+                population=int(cols[14] or 0),
+                timezone=cols[17],
+            )
+
+
+class CityIndex(ABC):
+    """
+    Prefix search over normalized city name keys.
+
+    Subclasses provide ``_keys`` (sorted), the city row each key points to in
+    ``_rows``, per-row ``_populations`` and ``_record``; matches are ranked
+    exact-name first, then by population.
+    """
+
+    _keys: Sequence
+    _rows: Sequence[int]
+    _populations: Sequence[int]
+
+    @abstractmethod
+    def __len__(self) -> int: ...
+
+    def _encode_key(self, key: str):
+        return key
+
+    @abstractmethod
+    def _record(self, row: int) -> CityRecord: ...
+
+    def close(self) -> None:
+        """Release any resources held by the index."""
+
+    def search(self, query: str, limit: int) -> List[City]:
+        """
+        Cities whose name starts with ``query``, best matches first.
+        """
+        normalized = normalize_name(query)
+        if not normalized:
+            return []
+        prefix = self._encode_key(normalized)
+        keys = self._keys
+        best: Dict[int, tuple] = {}
+        i = bisect_left(keys, prefix)
+        while i < len(keys):
+            key = keys[i]
+            if not key.startswith(prefix):
+                break
+            row = self._rows[i]
+            rank = (key == prefix, self._populations[row])
+            if rank > best.get(row, (False, -1)):
+                best[row] = rank
+            i += 1
+        top = heapq.nlargest(limit, best, key=best.__getitem__)
+        return [self._record(row).to_city() for row in top]
+
+
+class Gazetteer(CityIndex):
+    """
+    In-memory prefix index over a city list for offline autocomplete.
+
+    Cities are stored column-wise (interned strings, ``array`` numerics) and
+    looked up through a sorted list of normalized name keys, so a prefix query
+    is a binary search plus a scan of the matching key range.
+    """
+
+    def __init__(self, records: Iterable[CityRecord]):
+        strings: Dict[str, str] = {}
+
+        def intern(value: str) -> str:
+            return strings.setdefault(value, value)
+
+        self._names: List[str] = []
+        self._country_codes: List[str] = []
+        self._countries: List[str] = []
+        self._admin1: List[str] = []
+        self._timezones: List[str] = []
+        self._latitudes = array("d")
+        self._longitudes = array("d")
+        self._populations = array("Q")
+
+        entries = []
+        for row, rec in enumerate(records):
+            self._names.append(rec.name)
+            self._country_codes.append(intern(rec.country_code))
+            self._countries.append(intern(rec.country))
+            self._admin1.append(intern(rec.admin1))
+            self._timezones.append(intern(rec.timezone))
+            self._latitudes.append(rec.latitude)
+            self._longitudes.append(rec.longitude)
+            self._populations.append(rec.population)
+            for key in city_keys(rec):
+                entries.append((key, row))
+
+        entries.sort()
+        self._keys: List[str] = [key for key, _ in entries]
+        self._rows = array("I", (row for _, row in entries))
+
+    @classmethod
+    def from_file(cls, path: str | Path) -> "Gazetteer":
+        return cls(read_geonames(path))
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def _record(self, row: int) -> CityRecord:
+        return CityRecord(
+            name=self._names[row],
+            ascii_name=self._names[row],
+            country_code=self._country_codes[row],
+            country=self._countries[row],
+            admin1=self._admin1[row],
+            latitude=self._latitudes[row],
+            longitude=self._longitudes[row],
+            population=self._populations[row],
+            timezone=self._timezones[row],
+        )
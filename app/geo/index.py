@@ -0,0 +1,159 @@
+import mmap
+import struct
+from pathlib import Path
+from typing import Dict, Iterable, List
+
+from app.geo.gazetteer import CityIndex, CityRecord, Gazetteer, city_keys
+
+__all__ = ["MAGIC", "MappedGazetteer", "build_index", "load_gazetteer"]
+
+MAGIC = b"SKYGAZ01"
+
+# File layout (little-endian), all sections back to back:
+#   header   magic, city count, key count
+#   keys     sorted by UTF-8 bytes: string offset/length, city row
+#   cities   name, country code, country, admin1, timezone (offset/length
+#            pairs into the string pool), latitude, longitude, population
+#   strings  UTF-8 pool, values shared between cities stored once
+_HEADER = struct.Struct("<8sII")
+_KEY = struct.Struct("<IHI")
+_CITY = struct.Struct("<IH2sIHIHIHddQ")
+
+
+class _StringPool:
+    def __init__(self) -> None:
+        self.data = bytearray()
+        self._offsets: Dict[bytes, int] = {}
+
+    def add(self, value: str) -> tuple[int, int]:
+        raw = value.encode("utf-8")
+        offset = self._offsets.get(raw)
+        if offset is None:
+            offset = self._offsets[raw] = len(self.data)
+            self.data += raw
+        return offset, len(raw)
+
+
+def build_index(records: Iterable[CityRecord], path: str | Path) -> int:
+    """
+    Compile cities into a binary index file readable by ``MappedGazetteer``.
+    :return: number of cities written
+    """
+    pool = _StringPool()
+    cities = bytearray()
+    entries = []
+    count = 0
+    for row, rec in enumerate(records):
+        cities += _CITY.pack(
+            *pool.add(rec.name),
+            rec.country_code.encode("ascii")[:2].ljust(2),
+            *pool.add(rec.country),
+            *pool.add(rec.admin1),
+            *pool.add(rec.timezone),
+            rec.latitude,
+            rec.longitude,
+            rec.population,
+        )
+        for key in city_keys(rec):
+            entries.append((key.encode("utf-8"), row))
+        count = row + 1
+
+    entries.sort()
+    keys = bytearray()
+    for key, row in entries:
+        keys += _KEY.pack(*pool.add(key.decode("utf-8")), row)
+
+    with open(path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, count, len(entries)))
+        f.write(keys)
+        f.write(cities)
+        f.write(pool.data)
+    return count
+
+
+class _Column:
+    """Read-only sequence over one field of a fixed-size record table."""
+
+    def __init__(self, size: int, get):
+        self._size = size
+        self._get = get
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __getitem__(self, i: int):
+        return self._get(i)
+
+
+class MappedGazetteer(CityIndex):
+    """
+    Gazetteer backed by an index file from ``build_index``.
+
+    The file is memory-mapped read-only, so opening it is constant time and
+    worker processes share the same page cache; records are decoded only for
+    keys visited by a search.
+    """
+
+    def __init__(self, path: str | Path):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self._count, key_count = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            self._mm.close()
+            raise ValueError(f"{path} is not a gazetteer index")
+        self._keys_at = _HEADER.size
+        self._cities_at = self._keys_at + key_count * _KEY.size
+        self._strings_at = self._cities_at + self._count * _CITY.size
+
+        self._keys = _Column(key_count, self._key)
+        self._rows = _Column(key_count, self._key_row)
+        self._populations = _Column(self._count, self._population)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def close(self) -> None:
+        self._mm.close()
+
+    def _encode_key(self, key: str) -> bytes:
+        return key.encode("utf-8")
+
+    def _bytes(self, offset: int, length: int) -> bytes:
+        start = self._strings_at + offset
+        return self._mm[start : start + length]
+
+    def _key(self, i: int) -> bytes:
+        offset, length, _ = _KEY.unpack_from(self._mm, self._keys_at + i * _KEY.size)
+        return self._bytes(offset, length)
+
+    def _key_row(self, i: int) -> int:
+        return _KEY.unpack_from(self._mm, self._keys_at + i * _KEY.size)[2]
+
+    def _population(self, row: int) -> int:
+        return _CITY.unpack_from(self._mm, self._cities_at + row * _CITY.size)[-1]
+
+    def _record(self, row: int) -> CityRecord:
+        fields: List = list(
+            _CITY.unpack_from(self._mm, self._cities_at + row * _CITY.size)
+        )
+        name = self._bytes(fields[0], fields[1]).decode("utf-8")
+        return CityRecord(
+            name=name,
+            ascii_name=name,
+            country_code=fields[2].decode("ascii").strip(),
+            country=self._bytes(fields[3], fields[4]).decode("utf-8"),
+            admin1=self._bytes(fields[5], fields[6]).decode("utf-8"),
+            timezone=self._bytes(fields[7], fields[8]).decode("utf-8"),
+            latitude=fields[9],
+            longitude=fields[10],
+            population=fields[11],
+        )
+
+
+def load_gazetteer(path: str | Path) -> CityIndex:
+    """
+    Open a prebuilt index file, or parse a GeoNames dump into memory.
+    """
+    with open(path, "rb") as f:
+        is_index = f.read(len(MAGIC)) == MAGIC
+    return MappedGazetteer(path) if is_index else Gazetteer.from_file(path)
@@ -1,12 +1,45 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.staticfiles import StaticFiles
 from starlette.middleware import Middleware
 
+from app.core.config import settings
+from app.core.http import create_http_client
+from app.geo import load_gazetteer
 from app.middleware import AuthMiddleware
 from app.routers import api, web
+from app.services import weather
+from app.services.history import history_writer
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Open the shared Open-Meteo HTTP client and the search-history writer for
+    the lifetime of the app; pending history rows are flushed on shutdown.
+    The local gazetteer is loaded first when one is configured.
+    """
+    if settings.gazetteer_path:
+        weather.gazetteer = load_gazetteer(settings.gazetteer_path)
+    async with create_http_client() as client:
+        app.state.http_client = client
+        await history_writer.start()
+        try:
+            yield
+        finally:
+            await history_writer.stop()
+    app.state.http_client = None
+    if weather.gazetteer is not None:
+        weather.gazetteer.close()
+        weather.gazetteer = None
+
 
 middleware = [Middleware(AuthMiddleware)]
 
-app = FastAPI(title="SkyScan", middleware=middleware)
+app = FastAPI(title="SkyScan", middleware=middleware, lifespan=lifespan)
+
+app.mount("/static", StaticFiles(directory="app/static"), name="static")
 
 app.include_router(web.router)
 
@@ -1,40 +1,87 @@
 import uuid
+from http.cookies import SimpleCookie
 
-from fastapi import Request
 from sqlalchemy import select
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.datastructures import MutableHeaders
+from starlette.requests import HTTPConnection
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 from app.db.session import AsyncSessionLocal
 from app.models.user import User
+from app.services.users import CurrentUser, unknown_cookies, user_cache
 
+COOKIE_NAME = "anon_uuid"
 
-class AuthMiddleware(BaseHTTPMiddleware):
+
+async def _load_user_id(cookie: str) -> int | None:
+    """Resolve a cookie to a user id, hitting the database only on cache misses."""
+    user_id = user_cache.get(cookie)
+    if user_id is not None or cookie in unknown_cookies:
+        return user_id
+
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(select(User.id).filter_by(cookie_id=cookie))
+        user_id = result.scalar_one_or_none()
+    if user_id is None:
+        unknown_cookies.set(cookie, True)
+    else:
+        user_cache.set(cookie, user_id)
+    return user_id
+
+
+def _set_cookie_header(value: str) -> str:
+    """Build the Set-Cookie value Starlette's Response.set_cookie would emit."""
+    cookie: SimpleCookie = SimpleCookie()
+    cookie[COOKIE_NAME] = value
+    cookie[COOKIE_NAME]["path"] = "/"
+    cookie[COOKIE_NAME]["httponly"] = True
+    cookie[COOKIE_NAME]["samesite"] = "lax"
+    return cookie.output(header="").strip()
+
+
+class AuthMiddleware:
     """
-    Middleware: ensures each visitor has an anon_uuid cookie and User record, attaches User to request.state.user.
+    Middleware: ensures each visitor has an anon_uuid cookie and attaches a
+    CurrentUser to request.state.user. The users row is created lazily by
+    endpoints that write history (see app.services.users.ensure_user).
+
+    Implemented as a plain ASGI middleware: the response is passed through
+    untouched apart from an added Set-Cookie header for new visitors, which
+    also turns a public Cache-Control into a private one.
     """
 
-    async def dispatch(self, request: Request, call_next):
-        """Ensure each visitor has an anon_uuid cookie and User record."""
-        async with AsyncSessionLocal() as session:
-            cookie = request.cookies.get("anon_uuid")
-            if cookie:
-                result = await session.execute(select(User).filter_by(cookie_id=cookie))
-                user = result.scalar_one_or_none()
-                if not user:
-                    user = User(cookie_id=cookie)
-                    session.add(user)
-                    await session.commit()
-            else:
-                cookie = str(uuid.uuid4())
-                user = User(cookie_id=cookie)
-                session.add(user)
-                await session.commit()
-
-            request.state.user = user
-
-        response = await call_next(request)
-
-        if "anon_uuid" not in request.cookies:
-            response.set_cookie("anon_uuid", cookie, httponly=True)
-
-        return response
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        cookie = HTTPConnection(scope).cookies.get(COOKIE_NAME)
+        if cookie:
+            user = CurrentUser(cookie_id=cookie, id=await _load_user_id(cookie))
+        else:
+            user = CurrentUser(cookie_id=str(uuid.uuid4()))
+
+        scope.setdefault("state", {})["user"] = user
+
+        if cookie or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        set_cookie = _set_cookie_header(user.cookie_id)
+
+        async def send_with_cookie(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers.append("set-cookie", set_cookie)
+                # A shared cache must never hand this visitor's cookie to others.
+                cache_control = headers.get("cache-control")
+                if cache_control is not None and "public" in cache_control:
+                    headers["cache-control"] = cache_control.replace(
+                        "public", "private"
+                    )
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
@@ -1,4 +1,5 @@
+from .city_stats import CitySearchCount, UserCitySearchCount
 from .search_history import SearchHistory
 from .user import User
 
-__all__ = ["User", "SearchHistory"]
+__all__ = ["User", "SearchHistory", "CitySearchCount", "UserCitySearchCount"]
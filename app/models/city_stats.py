@@ -0,0 +1,91 @@
+from collections import Counter
+
+from sqlalchemy import Column, ForeignKey, Integer, String, event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.db.base import Base
+from app.models.search_history import SearchHistory
+
+
+class CitySearchCount(Base):
+    """How many times each city has been searched, across all users."""
+
+    __tablename__ = "city_search_counts"
+
+    city_name = Column(
+        String, primary_key=True, comment="Name of the city that was searched"
+    )
+
+    search_count = Column(
+        Integer,
+        nullable=False,
+        default=0,
+        comment="Number of search_history rows for this city",
+    )
+
+
+class UserCitySearchCount(Base):
+    """How many times one user has searched each city."""
+
+    __tablename__ = "user_city_search_counts"
+
+    user_id = Column(
+        Integer,
+        ForeignKey("users.id", ondelete="CASCADE"),
+        primary_key=True,
+        comment="Foreign key linking back to users.id",
+    )
+
+    city_name = Column(
+        String, primary_key=True, comment="Name of the city that was searched"
+    )
+
+    search_count = Column(
+        Integer,
+        nullable=False,
+        default=0,
+        comment="Number of search_history rows for this user and city",
+    )
+
+
+_UPSERT_DIALECTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def _increment(connection, model, key_columns: list[str], counts: Counter) -> None:
+    insert = _UPSERT_DIALECTS[connection.dialect.name]
+    # Sorted keys give concurrent transactions the same lock order.
+    rows = [
+        {**dict(zip(key_columns, key)), "search_count": n}
+        for key, n in sorted(counts.items())
+    ]
+    stmt = insert(model).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=key_columns,
+        set_={"search_count": model.search_count + stmt.excluded.search_count},
+    )
+    connection.execute(stmt)
+
+
+@event.listens_for(Session, "after_flush")
+def _count_new_searches(session: Session, flush_context) -> None:
+    """
+    Keep the aggregate tables in step with SearchHistory rows inserted
+    through the ORM, inside the same transaction.
+    """
+    new = [obj for obj in session.new if isinstance(obj, SearchHistory)]
+    if not new:
+        return
+    connection = session.connection()
+    _increment(
+        connection,
+        CitySearchCount,
+        ["city_name"],
+        Counter((obj.city_name,) for obj in new),
+    )
+    _increment(
+        connection,
+        UserCitySearchCount,
+        ["user_id", "city_name"],
+        Counter((obj.user_id, obj.city_name) for obj in new),
+    )
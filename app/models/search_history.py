@@ -1,6 +1,6 @@
 from datetime import datetime, timezone
 
-from sqlalchemy import DATETIME, Column, ForeignKey, Integer, String
+from sqlalchemy import DATETIME, Column, ForeignKey, Index, Integer, String, func
 from sqlalchemy.orm import relationship
 
 from app.db.base import Base
@@ -22,7 +22,6 @@ class SearchHistory(Base):
         Integer,
         ForeignKey("users.id", ondelete="CASCADE"),
         nullable=False,
-        index=True,
         comment="Foreign key linking back to users.id",
     )
 
@@ -39,3 +38,29 @@ class SearchHistory(Base):
     )
 
     user = relationship("User", back_populates="search_history")
+
+
+# Serves per-user history newest first (and keyset pagination over it); also
+# covers plain user_id lookups, so no separate user_id index is needed.
+Index(
+    "ix_search_history_user_id_searched_at",
+    SearchHistory.user_id,
+    SearchHistory.search_at.desc(),
+)
+
+# Autocomplete over history (see history_suggestions_stmt); created by the
+# 9b7c3e2d6a10 migration, declared here so autogenerate keeps them.
+# Prefix matching: lower(city_name) LIKE 'q%' within one user's history
+Index(
+    "ix_search_history_user_id_city_name_pattern",
+    SearchHistory.user_id,
+    func.lower(SearchHistory.city_name).label("city_name_lower"),
+    postgresql_ops={"city_name_lower": "text_pattern_ops"},
+)
+# Substring matching: lower(city_name) LIKE '%q%' (needs pg_trgm)
+Index(
+    "ix_search_history_city_name_trgm",
+    func.lower(SearchHistory.city_name).label("city_name_lower"),
+    postgresql_using="gin",
+    postgresql_ops={"city_name_lower": "gin_trgm_ops"},
+)
@@ -1,15 +1,60 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, Request
-from sqlalchemy import desc, func, not_, select
+import asyncio
+import base64
+import logging
+import math
+import time
+from contextlib import suppress
+from datetime import datetime, timezone
+
+import httpx
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    WebSocket,
+    WebSocketDisconnect,
+    status,
+)
+from fastapi.responses import StreamingResponse
+from sqlalchemy import and_, func, or_, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.session import get_async_session
+from app.core.caching import (
+    PRIVATE_NO_CACHE,
+    cache_control,
+    conditional_response,
+    not_modified,
+    version_etag,
+)
+from app.core.config import settings
+from app.core.fastjson import FastJSONResponse, dumps, loads
+from app.core.http import get_http_client
+from app.db.session import AsyncSessionLocal, get_async_session
+from app.models.city_stats import CitySearchCount, UserCitySearchCount
 from app.models.search_history import SearchHistory
 from app.schemas.history import HistoryItem, StatsItem
 from app.schemas.weather import City as CitySchema
-from app.schemas.weather import ForecastResponse
-from app.services.weather import WeatherServiceError, fetch_weather_by_city, search_city
+from app.schemas.weather import (
+    ForecastResponse,
+    WeatherBatchItem,
+    WeatherBatchRequest,
+)
+from app.services.history import log_search, log_searches
+from app.services.suggest import blended_suggestions, streamed_suggestions
+from app.services.users import ensure_user
+from app.services.weather import (
+    UpstreamUnavailableError,
+    WeatherServiceError,
+    load_weather_batch,
+    load_weather_by_city,
+)
+
+logger = logging.getLogger(__name__)
 
-router = APIRouter(tags=["weather"])
+router = APIRouter(tags=["weather"], default_response_class=FastJSONResponse)
 
 
 @router.get("/health", tags=["api"])
@@ -23,55 +68,184 @@ async def suggest_city(
     query: str = Query(..., min_length=1, description="City name to autocomplete"),
     limit: int = Query(15, ge=1, le=50, description="Max suggestions to return"),
     session: AsyncSession = Depends(get_async_session),
+    client: httpx.AsyncClient | None = Depends(get_http_client),
 ):
     """
     Blended autocomplete:
       1) Top-5 history prefix matches
       2) Top-5 history substring matches
-      3) Up to `limit` external suggestions
+         (both from one query, see history_suggestions_stmt)
+      3) Up to `limit` external suggestions, fetched concurrently with 1-2
+         and skipped if they miss the upstream deadline
       → merge, dedupe, return up to `limit`
+    Includes the user's own history, so it is only cacheable privately.
     """
-    user_id = request.state.user.id
+    try:
+        cities = await blended_suggestions(
+            session, request.state.user.id, query, limit, client=client
+        )
+    except UpstreamUnavailableError as e:
+        raise _unavailable(e)
+    except WeatherServiceError as e:
+        raise HTTPException(status_code=502, detail=str(e))
+    return conditional_response(
+        request,
+        dumps([c.model_dump(mode="json") for c in cities]),
+        cache_control(
+            settings.suggest_max_age,
+            settings.api_stale_while_revalidate,
+            private=True,
+        ),
+    )
+
 
-    prefix_stmt = (
-        select(SearchHistory.city_name, func.count().label("freq"))
-        .filter(SearchHistory.user_id == user_id)
-        .filter(SearchHistory.city_name.ilike(f"{query}%"))
-        .group_by(SearchHistory.city_name)
-        .order_by(desc("freq"))
-        .limit(5)
+@router.get("/suggest/stream")
+async def suggest_city_stream(
+    request: Request,
+    query: str = Query(..., min_length=1, description="City name to autocomplete"),
+    limit: int = Query(15, ge=1, le=50, description="Max suggestions to return"),
+    session: AsyncSession = Depends(get_async_session),
+    client: httpx.AsyncClient | None = Depends(get_http_client),
+):
+    """
+    Streaming autocomplete as NDJSON, one City object per line:
+      1) the user's history matches, sent as soon as the database answers
+      2) then the external suggestions not already sent, up to `limit` total
+    If the external lookup fails, the stream ends with an {"error": ...} line.
+    """
+    batches = streamed_suggestions(
+        session, request.state.user.id, query, limit, client=client
     )
-    prefix_rows = (await session.execute(prefix_stmt)).all()
-    prefix_sugs = [CitySchema(name=name) for name, freq in prefix_rows]
-    prefix_names = {name for name, _ in prefix_rows}
-
-    substr_stmt = (
-        select(SearchHistory.city_name, func.count().label("freq"))
-        .filter(SearchHistory.user_id == user_id)
-        .filter(SearchHistory.city_name.ilike(f"%{query}%"))
-        .filter(not_(SearchHistory.city_name.in_(prefix_names)))
-        .group_by(SearchHistory.city_name)
-        .order_by(desc("freq"))
-        .limit(5)
+    # Run the history query now, while the request's session is still open.
+    history = await anext(batches)
+
+    async def body():
+        try:
+            for city in history:
+                yield dumps(city.model_dump(mode="json")) + b"\n"
+            async for batch in batches:
+                for city in batch:
+                    yield dumps(city.model_dump(mode="json")) + b"\n"
+        except WeatherServiceError as e:
+            yield dumps({"error": str(e)}) + b"\n"
+        finally:
+            await batches.aclose()
+
+    return StreamingResponse(
+        body(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": PRIVATE_NO_CACHE},
     )
-    substr_rows = (await session.execute(substr_stmt)).all()
-    substr_sugs = [CitySchema(name=name) for name, freq in substr_rows]
 
+
+@router.websocket("/suggest/ws")
+async def suggest_city_ws(
+    websocket: WebSocket,
+    client: httpx.AsyncClient | None = Depends(get_http_client),
+):
+    """
+    Autocomplete over one long-lived connection.
+
+    The client sends {"query": str, "limit": int (optional, 1-50)} per
+    keystroke. For each query the server sends non-empty batches as
+    {"query", "results"} (history matches first, then new external
+    suggestions), an {"query", "error"} if the external lookup fails, and
+    finally {"query", "done": true}. A new message cancels the work still
+    running for the previous query, so superseded keystrokes get no replies.
+    Geocoding waits `suggest_ws_debounce` seconds first, and a superseded
+    call still in flight is aborted unless another request shares it.
+    Binary frames close the connection with code 1003 (unsupported data).
+    """
+    await websocket.accept()
+    user_id = websocket.state.user.id
+    task: asyncio.Task | None = None
+    try:
+        while True:
+            frame = await websocket.receive()
+            if frame["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(frame.get("code", 1000))
+            text = frame.get("text")
+            if text is None:
+                await websocket.close(code=status.WS_1003_UNSUPPORTED_DATA)
+                break
+            try:
+                message = loads(text)
+                query = str(message.get("query", "")).strip()
+                limit = min(max(int(message.get("limit", 15)), 1), 50)
+            except (ValueError, TypeError, AttributeError):
+                await _send_ws(websocket, {"error": "Invalid message"})
+                continue
+            if task is not None:
+                task.cancel()
+                task = None
+            if query:
+                task = asyncio.create_task(
+                    _send_suggestions(websocket, user_id, query, limit, client)
+                )
+    except WebSocketDisconnect:
+        pass
+    finally:
+        if task is not None:
+            task.cancel()
+
+
+async def _send_ws(websocket: WebSocket, payload: dict) -> None:
+    await websocket.send_text(dumps(payload).decode())
+
+
+async def _send_suggestions(
+    websocket: WebSocket,
+    user_id: int | None,
+    query: str,
+    limit: int,
+    client: httpx.AsyncClient | None,
+) -> None:
+    """
+    Background task answering one query. Unexpected errors (the database,
+    a closed socket) are logged here rather than left on the task, and the
+    client still gets an error and "done" if the socket is open.
+    """
+    try:
+        await _stream_suggestions(websocket, user_id, query, limit, client)
+    except Exception:
+        logger.exception("WebSocket suggestions for %r failed", query)
+        with suppress(Exception):  # the socket may already be closed
+            await _send_ws(websocket, {"query": query, "error": "Suggestions failed"})
+            await _send_ws(websocket, {"query": query, "done": True})
+
+
+async def _stream_suggestions(
+    websocket: WebSocket,
+    user_id: int | None,
+    query: str,
+    limit: int,
+    client: httpx.AsyncClient | None,
+) -> None:
+    # Hold the DB session only for the history query (the first batch).
+    async with AsyncSessionLocal() as session:
+        batches = streamed_suggestions(
+            session,
+            user_id,
+            query,
+            limit,
+            client=client,
+            upstream_delay=settings.suggest_ws_debounce,
+        )
+        history = await anext(batches)
     try:
-        api_sugs = await search_city(query, max_results=limit)
+        if history:
+            await _send_ws(websocket, _results_message(query, history))
+        async for batch in batches:
+            await _send_ws(websocket, _results_message(query, batch))
     except WeatherServiceError as e:
-        raise HTTPException(status_code=502, detail=str(e))
+        await _send_ws(websocket, {"query": query, "error": str(e)})
+    finally:
+        await batches.aclose()
+    await _send_ws(websocket, {"query": query, "done": True})
 
-    seen = set()
-    merged: list[CitySchema] = []
-    for src in (*prefix_sugs, *substr_sugs, *api_sugs):
-        if src.name not in seen:
-            seen.add(src.name)
-            merged.append(src)
-        if len(merged) >= limit:
-            break
 
-    return merged
+def _results_message(query: str, cities: list[CitySchema]) -> dict:
+    return {"query": query, "results": [c.model_dump(mode="json") for c in cities]}
 
 
 @router.get("/weather", response_model=ForecastResponse, tags=["weather"])
@@ -79,60 +253,203 @@ async def get_weather(
     request: Request,
     session: AsyncSession = Depends(get_async_session),
     city: str = Query(..., min_length=1, description="City name to fetch weather for"),
+    start: str | None = Query(
+        None,
+        alias="from",
+        description="Skip earlier hours: 'now' or an ISO-8601 timestamp (UTC if naive)",
+    ),
+    hours: int | None = Query(None, ge=1, le=384, description="Max hours to return"),
+    client: httpx.AsyncClient | None = Depends(get_http_client),
 ):
     """
     Fetch weather for a given city name and log the search.
+    Without `from`/`hours` the body is the cached forecast's pre-serialized
+    ForecastResponse JSON; with them, only that window of hours.
+    Every request is logged, so the response is private and must be
+    revalidated: a cache hit would skip the log, and a shared cache could
+    hand a new visitor's Set-Cookie to others.
     """
+    start_at = _parse_start(start)
     try:
-        city_obj, forecast = await fetch_weather_by_city(city)
-        session.add(
-            SearchHistory(user_id=request.state.user.id, city_name=city_obj.name)
-        )
-        await session.commit()
-        return forecast
+        city_obj, forecast = await load_weather_by_city(city, client=client)
+        user_id = await ensure_user(session, request.state.user)
+        await log_search(session, user_id, city_obj.name)
+    except UpstreamUnavailableError as e:
+        raise _unavailable(e)
     except WeatherServiceError as e:
         raise HTTPException(status_code=404, detail=str(e))
+    window = forecast.window(start=start_at, hours=hours)
+    return conditional_response(
+        request,
+        window.to_json,
+        PRIVATE_NO_CACHE,
+        etag=version_etag("weather", window.version),
+    )
+
+
+@router.post("/weather/batch", response_model=list[WeatherBatchItem], tags=["weather"])
+async def get_weather_batch(
+    request: Request,
+    batch: WeatherBatchRequest,
+    session: AsyncSession = Depends(get_async_session),
+    client: httpx.AsyncClient | None = Depends(get_http_client),
+):
+    """
+    Fetch weather for many locations at once, each a city name or a
+    latitude/longitude pair. Names are resolved concurrently and forecasts
+    fetched several locations per upstream request.
+    Returns one item per location, in order, holding either the city and
+    forecast or an error; cities found are logged to history in one insert.
+    """
+    locations = [
+        loc.city if loc.city is not None else (loc.latitude, loc.longitude)
+        for loc in batch.locations
+    ]
+    results = await load_weather_batch(locations, client=client)
+
+    searched = [r.city.name for r in results if r.city is not None and not r.error]
+    if searched:
+        user_id = await ensure_user(session, request.state.user)
+        await log_searches(session, user_id, searched)
+
+    # Splice in each forecast's cached JSON rather than re-serializing it.
+    items = []
+    for result in results:
+        city = (
+            b"null"
+            if result.city is None
+            else dumps(result.city.model_dump(mode="json"))
+        )
+        if result.forecast is None:
+            forecast, error = b"null", dumps(result.error)
+        else:
+            forecast, error = result.forecast.to_json(), b"null"
+        items.append(b'{"city":%s,"forecast":%s,"error":%s}' % (city, forecast, error))
+    return Response(b"[" + b",".join(items) + b"]", media_type="application/json")
+
+
+def _unavailable(e: UpstreamUnavailableError) -> HTTPException:
+    """503 for a rate-limited or failing upstream, passing on its Retry-After."""
+    headers = None
+    if e.retry_after is not None:
+        headers = {"Retry-After": str(math.ceil(e.retry_after))}
+    return HTTPException(status_code=503, detail=str(e), headers=headers)
+
+
+def _parse_start(value: str | None) -> float | None:
+    if value is None:
+        return None
+    if value == "now":
+        return time.time()
+    try:
+        if value.endswith("Z"):
+            value = value[:-1] + "+00:00"
+        start = datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid 'from' timestamp")
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=timezone.utc)
+    return start.timestamp()
+
+
+def _encode_cursor(search_at: datetime, row_id: int) -> str:
+    raw = f"{search_at.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        search_at, row_id = base64.urlsafe_b64decode(cursor).decode().split("|")
+        return datetime.fromisoformat(search_at), int(row_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
 
 @router.get("/history", response_model=list[HistoryItem], tags=["weather"])
 async def get_history(
-    request: Request, session: AsyncSession = Depends(get_async_session)
+    request: Request,
+    response: Response,
+    limit: int = Query(50, ge=1, le=500, description="Max items to return"),
+    cursor: str | None = Query(
+        None, description="X-Next-Cursor value from the previous page"
+    ),
+    session: AsyncSession = Depends(get_async_session),
 ):
     """
     Return the search history for the current anonymous user, the most recent first.
+    Paginated by keyset on (searched_at, id): when more items exist, the
+    X-Next-Cursor response header holds the cursor for the next page.
     """
+    response.headers["Cache-Control"] = PRIVATE_NO_CACHE
+    if request.state.user.id is None:
+        return []
     stmt = (
-        select(SearchHistory)
-        .filter_by(user_id=request.state.user.id)
-        .order_by(SearchHistory.search_at.desc())
+        select(SearchHistory.id, SearchHistory.city_name, SearchHistory.search_at)
+        .filter(SearchHistory.user_id == request.state.user.id)
+        .order_by(SearchHistory.search_at.desc(), SearchHistory.id.desc())
+        .limit(limit + 1)
     )
-    result = await session.execute(stmt)
-    return result.scalars().all()
+    if cursor is not None:
+        search_at, row_id = _decode_cursor(cursor)
+        stmt = stmt.filter(
+            or_(
+                SearchHistory.search_at < search_at,
+                and_(SearchHistory.search_at == search_at, SearchHistory.id < row_id),
+            )
+        )
+    rows = (await session.execute(stmt)).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = _encode_cursor(rows[-1][2], rows[-1][0])
+    return [
+        HistoryItem(city_name=city_name, search_at=search_at)
+        for _, city_name, search_at in rows
+    ]
 
 
 @router.get("/stats", response_model=list[StatsItem], tags=["weather"])
-async def get_stats(session: AsyncSession = Depends(get_async_session)):
+async def get_stats(
+    request: Request, session: AsyncSession = Depends(get_async_session)
+):
     """
     Return global counts of how many times each city has been searched.
+    Counts only ever grow, so their total versions the response: a client
+    revalidating an unchanged list costs one aggregate query.
     """
-    stmt = select(SearchHistory.city_name, func.count().label("count")).group_by(
-        SearchHistory.city_name
+    total = await session.scalar(
+        select(func.coalesce(func.sum(CitySearchCount.search_count), 0))
+    )
+    etag = version_etag("stats", total)
+    policy = cache_control(settings.stats_max_age, settings.api_stale_while_revalidate)
+    response = not_modified(request, etag, policy)
+    if response is not None:
+        return response
+    stmt = select(CitySearchCount.city_name, CitySearchCount.search_count).order_by(
+        CitySearchCount.city_name
     )
     rows = (await session.execute(stmt)).all()
-    return [StatsItem(city_name=city, count=count) for city, count in rows]
+    return conditional_response(
+        request,
+        dumps([{"city_name": city, "count": count} for city, count in rows]),
+        policy,
+        etag=etag,
+    )
 
 
 @router.get("/user/stats", response_model=list[StatsItem])
 async def get_user_stats(
-    request: Request, session: AsyncSession = Depends(get_async_session)
+    request: Request,
+    response: Response,
+    session: AsyncSession = Depends(get_async_session),
 ):
     """
     How many times YOU have searched each city.
     """
-    stmt = (
-        select(SearchHistory.city_name, func.count().label("count"))
-        .filter(SearchHistory.user_id == request.state.user.id)
-        .group_by(SearchHistory.city_name)
-    )
+    response.headers["Cache-Control"] = PRIVATE_NO_CACHE
+    if request.state.user.id is None:
+        return []
+    stmt = select(
+        UserCitySearchCount.city_name, UserCitySearchCount.search_count
+    ).filter(UserCitySearchCount.user_id == request.state.user.id)
     rows = (await session.execute(stmt)).all()
     return [StatsItem(city_name=city, count=count) for city, count in rows]
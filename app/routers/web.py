@@ -1,19 +1,53 @@
-from datetime import datetime
+import time
 from zoneinfo import ZoneInfo
 
+import httpx
 from fastapi import APIRouter, Depends, Form, HTTPException, Request
 from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
+from markupsafe import Markup
 from sqlalchemy import desc, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.config import settings
+from app.core.http import get_http_client
 from app.db.session import get_async_session
 from app.models.search_history import SearchHistory
-from app.services.weather import WeatherServiceError, fetch_weather_by_city
+from app.schemas.weather import City
+from app.services.cache import TTLCache
+from app.services.forecast import Forecast, ForecastWindow
+from app.services.history import log_search
+from app.services.users import ensure_user
+from app.services.weather import WeatherServiceError, load_weather_by_city
 
 router = APIRouter(tags=["web"])
 templates = Jinja2Templates(directory="app/templates")
 
+PREVIEW_HOURS = 6
+
+# Rendered forecast tables, keyed by (city, timezone, forecast generation,
+# first hour shown); identical for every user looking at the same forecast.
+forecast_fragments: TTLCache[tuple, Markup] = TTLCache(
+    maxsize=settings.fragment_cache_max_entries, ttl=settings.fragment_cache_ttl
+)
+
+
+def render_forecast_table(
+    city: City, forecast: Forecast, upcoming: ForecastWindow
+) -> Markup:
+    """
+    Render the forecast table partial, reusing the cached fragment when the
+    same forecast was already rendered from the same hour.
+    """
+    key = (city.name, city.timezone, forecast.generation, upcoming.start)
+    html = forecast_fragments.get(key)
+    if html is None:
+        preview = upcoming.head(PREVIEW_HOURS).local_entries(ZoneInfo(city.timezone))
+        template = templates.get_template("partials/forecast_table.html")
+        html = Markup(template.render(city=city, preview=preview))
+        forecast_fragments.set(key, html)
+    return html
+
 
 @router.get("/", response_class=HTMLResponse)
 async def read_root(
@@ -25,14 +59,16 @@ async def read_root(
         :param session:
         :return: HTMLResponse with the main page.
     """
-    stmt = (
-        select(SearchHistory.city_name)
-        .filter_by(user_id=request.state.user.id)
-        .order_by(desc(SearchHistory.search_at))
-        .limit(5)
-    )
-    rows = await session.execute(stmt)
-    recent_cities = [r[0] for r in rows.all()]
+    recent_cities = []
+    if request.state.user.id is not None:
+        stmt = (
+            select(SearchHistory.city_name)
+            .filter_by(user_id=request.state.user.id)
+            .order_by(desc(SearchHistory.search_at))
+            .limit(5)
+        )
+        rows = await session.execute(stmt)
+        recent_cities = [r[0] for r in rows.all()]
 
     return templates.TemplateResponse(
         "index.html",
@@ -40,8 +76,7 @@ async def read_root(
             "request": request,
             "city": None,
             "recent_cities": recent_cities,
-            "preview": [],
-            "full": [],
+            "forecast_table": None,
         },
     )
 
@@ -51,46 +86,37 @@ async def post_weather(
     request: Request,
     city: str = Form(...),
     session: AsyncSession = Depends(get_async_session),
+    client: httpx.AsyncClient | None = Depends(get_http_client),
 ):
     """
     Fetch weather for a given city and render the results.
         :param request:
         :param city:
         :param session:
+        :param client:
         :return:
     """
     try:
-        city_obj, forecast = await fetch_weather_by_city(city)
+        city_obj, forecast = await load_weather_by_city(city, client=client)
     except WeatherServiceError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
-    session.add(SearchHistory(user_id=request.state.user.id, city_name=city_obj.name))
-    await session.commit()
+    user_id = await ensure_user(session, request.state.user)
 
+    # Read the previous searches before logging this one: with the
+    # write-behind history writer the new row may not be flushed yet.
     stmt = (
         select(SearchHistory.city_name)
-        .filter_by(user_id=request.state.user.id)
+        .filter_by(user_id=user_id)
         .order_by(desc(SearchHistory.search_at))
-        .limit(5)
+        .limit(4)
     )
     rows = await session.execute(stmt)
-    recent_cities = [r[0] for r in rows.all()]
-
-    tz = ZoneInfo(city_obj.timezone)
-    now_local = datetime.now(tz)
-
-    entries = list(zip(forecast.hourly.time, forecast.hourly.temperature_2m))
-    future_entries = []
-    for t, temp in entries:
-        t_local = t.astimezone(tz) if t.tzinfo else t.replace(tzinfo=tz)
-        if t_local >= now_local:
-            future_entries.append((t_local, temp))
+    recent_cities = [city_obj.name, *(r[0] for r in rows.all())]
 
-    if not future_entries:
-        future_entries = entries
+    await log_search(session, user_id, city_obj.name)
 
-    preview = future_entries[:6]
-    full = future_entries
+    upcoming = forecast.window(start=time.time()) or forecast.window()
 
     return templates.TemplateResponse(
         "index.html",
@@ -98,7 +124,10 @@ async def post_weather(
             "request": request,
             "city": city_obj,
             "recent_cities": recent_cities,
-            "preview": preview,
-            "full": full,
+            "forecast_table": (
+                render_forecast_table(city_obj, forecast, upcoming)
+                if upcoming
+                else None
+            ),
         },
     )
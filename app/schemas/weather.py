@@ -1,12 +1,15 @@
 from datetime import datetime
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 
 __all__ = [
     "City",
     "GeocodingResponse",
     "ForecastHourly",
     "ForecastResponse",
+    "BatchLocation",
+    "WeatherBatchRequest",
+    "WeatherBatchItem",
 ]
 
 
@@ -85,3 +88,42 @@ class ForecastResponse(BaseModel):
         None, description="Elevation above sea level in meters (optional)"
     )
     hourly: ForecastHourly = Field(..., description="Hourly weather data arrays")
+
+
+class BatchLocation(BaseModel):
+    """
+    One location in a batch weather request: a city name to autocomplete,
+    or explicit coordinates.
+    """
+
+    city: str | None = Field(None, min_length=1, description="City name")
+    latitude: float | None = Field(None, ge=-90, le=90)
+    longitude: float | None = Field(None, ge=-180, le=180)
+
+    @model_validator(mode="after")
+    def _city_or_coordinates(self) -> "BatchLocation":
+        coords = (self.latitude, self.longitude)
+        if self.city is not None and coords == (None, None):
+            return self
+        if self.city is None and None not in coords:
+            return self
+        raise ValueError("Give either a city name or both latitude and longitude")
+
+
+class WeatherBatchRequest(BaseModel):
+    """
+    Request body for the batch weather endpoint.
+    """
+
+    locations: list[BatchLocation] = Field(..., min_length=1, max_length=200)
+
+
+class WeatherBatchItem(BaseModel):
+    """
+    Result for one requested location, in request order: either the
+    resolved city (None for coordinates) and its forecast, or an error.
+    """
+
+    city: City | None = None
+    forecast: ForecastResponse | None = None
+    error: str | None = None
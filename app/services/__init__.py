@@ -1,7 +1,15 @@
-from .weather import WeatherServiceError, get_forecast, search_city
+from .weather import (
+    UpstreamRateLimitError,
+    UpstreamUnavailableError,
+    WeatherServiceError,
+    get_forecast,
+    search_city,
+)
 
 __all__ = [
     "WeatherServiceError",
+    "UpstreamRateLimitError",
+    "UpstreamUnavailableError",
     "search_city",
     "get_forecast",
 ]
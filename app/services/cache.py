@@ -0,0 +1,188 @@
+import sys
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Generic, Hashable, Protocol, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+__all__ = ["Cache", "CacheLookup", "CacheStats", "TTLCache"]
+
+
+@dataclass(frozen=True)
+class CacheLookup(Generic[V]):
+    """
+    A cached value and whether it is still within its TTL.
+    """
+
+    value: V
+    fresh: bool
+
+
+class Cache(Protocol[K, V]):
+    """
+    Minimal interface the services expect from a cache backend.
+    """
+
+    def get(self, key: K) -> V | None: ...
+
+    def lookup(self, key: K) -> CacheLookup[V] | None: ...
+
+    def set(self, key: K, value: V) -> None: ...
+
+    def clear(self) -> None: ...
+
+
+@dataclass
+class CacheStats:
+    """
+    Counters describing how a cache has been used since it was created.
+    """
+
+    hits: int = 0
+    stale_hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.stale_hits + self.misses
+        return (self.hits + self.stale_hits) / total if total else 0.0
+
+
+class _Entry(Generic[V]):
+    __slots__ = ("value", "expires_at", "discard_at", "size")
+
+    def __init__(self, value: V, expires_at: float, discard_at: float, size: int):
+        self.value = value
+        self.expires_at = expires_at
+        self.discard_at = discard_at
+        self.size = size
+
+
+class TTLCache(Generic[K, V]):
+    """
+    In-process cache with a per-entry TTL and LRU eviction.
+
+    The cache is bounded by entry count and, optionally, by an approximate
+    memory budget computed with ``sizeof``. With ``stale_ttl`` set, expired
+    entries are kept that much longer and remain reachable through
+    ``lookup`` for stale-while-revalidate callers. Not thread-safe; meant to
+    be used from a single event loop.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float,
+        max_bytes: int | None = None,
+        sizeof: Callable[[V], int] = sys.getsizeof,
+        clock: Callable[[], float] = time.monotonic,
+        stale_ttl: float = 0.0,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_bytes = max_bytes
+        self.stats = CacheStats()
+        self._sizeof = sizeof
+        self._clock = clock
+        self._data: OrderedDict[K, _Entry[V]] = OrderedDict()
+        self._nbytes = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: object) -> bool:
+        entry = self._data.get(key)  # type: ignore[call-overload]
+        return entry is not None and entry.expires_at > self._clock()
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by cached values."""
+        return self._nbytes
+
+    def get(self, key: K) -> V | None:
+        """
+        Return the cached value, or None if it is missing or expired.
+        """
+        found = self._find(key)
+        if found is None or not found.fresh:
+            self.stats.misses += 1
+            return None
+        self.stats.hits += 1
+        return found.value
+
+    def lookup(self, key: K) -> CacheLookup[V] | None:
+        """
+        Return the cached value along with its freshness, including entries
+        past their TTL but still inside the ``stale_ttl`` window.
+        """
+        found = self._find(key)
+        if found is None:
+            self.stats.misses += 1
+        elif found.fresh:
+            self.stats.hits += 1
+        else:
+            self.stats.stale_hits += 1
+        return found
+
+    def peek(self, key: K) -> V | None:
+        """
+        Return a fresh value without touching LRU order or hit/miss counters.
+        """
+        entry = self._data.get(key)
+        if entry is None or entry.expires_at <= self._clock():
+            return None
+        return entry.value
+
+    def set(self, key: K, value: V) -> None:
+        """
+        Store a value, evicting least recently used entries to stay in bounds.
+        """
+        if key in self._data:
+            self._remove(key)
+        size = self._sizeof(value)
+        expires_at = self._clock() + self.ttl
+        self._data[key] = _Entry(value, expires_at, expires_at + self.stale_ttl, size)
+        self._nbytes += size
+        self._evict()
+
+    def pop(self, key: K) -> V | None:
+        """Remove a key, returning its value if it was present."""
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        self._remove(key)
+        return entry.value
+
+    def clear(self) -> None:
+        self._data.clear()
+        self._nbytes = 0
+
+    def _find(self, key: K) -> CacheLookup[V] | None:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        now = self._clock()
+        if entry.discard_at <= now:
+            self._remove(key)
+            self.stats.expirations += 1
+            return None
+        self._data.move_to_end(key)
+        return CacheLookup(entry.value, entry.expires_at > now)
+
+    def _remove(self, key: K) -> None:
+        entry = self._data.pop(key)
+        self._nbytes -= entry.size
+
+    def _evict(self) -> None:
+        while self._data and (
+            len(self._data) > self.maxsize
+            or (self.max_bytes is not None and self._nbytes > self.max_bytes)
+        ):
+            key = next(iter(self._data))
+            self._remove(key)
+            self.stats.evictions += 1
@@ -0,0 +1,269 @@
+import hashlib
+import itertools
+from array import array
+from bisect import bisect_left
+from datetime import datetime, timedelta, timezone, tzinfo
+from typing import Any, List, Mapping, Sequence, Tuple
+
+from app.core.fastjson import dumps
+from app.schemas.weather import ForecastHourly, ForecastResponse
+
+__all__ = ["Forecast", "ForecastWindow"]
+
+_EPOCH = datetime(1970, 1, 1)
+_generations = itertools.count(1)
+
+
+def _epoch_seconds(value: str, utc_offset: int) -> tuple[int, bool]:
+    """
+    Parse an ISO-8601 timestamp to UTC epoch seconds; naive values are local
+    time at ``utc_offset``. Also returns whether the value carried an offset.
+    """
+    if value.endswith("Z"):
+        value = value[:-1] + "+00:00"
+    dt = datetime.fromisoformat(value)
+    if dt.tzinfo is not None:
+        return int(dt.timestamp()), True
+    return (dt - _EPOCH) // timedelta(seconds=1) - utc_offset, False
+
+
+class Forecast:
+    """
+    Hourly forecast held column-wise: UTC epoch seconds, temperatures and
+    weather codes in ``array`` buffers, plus the location metadata.
+
+    Built straight from the upstream JSON without per-element pydantic
+    validation. ``to_response`` and ``to_json`` produce the public
+    ``ForecastResponse`` shape and are computed once per instance, so a
+    cached forecast is serialized only once.
+    """
+
+    __slots__ = (
+        "latitude",
+        "longitude",
+        "generationtime_ms",
+        "utc_offset_seconds",
+        "timezone",
+        "timezone_abbreviation",
+        "elevation",
+        "times",
+        "temperatures",
+        "weathercodes",
+        "aware",
+        "generation",
+        "_response",
+        "_json",
+        "_version",
+    )
+
+    def __init__(
+        self,
+        *,
+        latitude: float,
+        longitude: float,
+        generationtime_ms: float,
+        utc_offset_seconds: int,
+        timezone: str,
+        timezone_abbreviation: str,
+        elevation: float | None,
+        times: array,
+        temperatures: array,
+        weathercodes: array,
+        aware: bool = False,
+    ):
+        if not len(times) == len(temperatures) == len(weathercodes):
+            raise ValueError("Hourly forecast arrays differ in length")
+        self.latitude = latitude
+        self.longitude = longitude
+        self.generationtime_ms = generationtime_ms
+        self.utc_offset_seconds = utc_offset_seconds
+        self.timezone = timezone
+        self.timezone_abbreviation = timezone_abbreviation
+        self.elevation = elevation
+        self.times = times
+        self.temperatures = temperatures
+        self.weathercodes = weathercodes
+        # Whether timestamps are reported in UTC rather than local wall time
+        self.aware = aware
+        # Distinguishes this fetch from earlier ones for the same location
+        self.generation = next(_generations)
+        self._response: ForecastResponse | None = None
+        self._json: bytes | None = None
+        self._version: str | None = None
+
+    @classmethod
+    def from_payload(cls, data: Mapping[str, Any]) -> "Forecast":
+        """
+        Build a forecast from a decoded Open-Meteo response. Hourly ``time``
+        may be unix seconds (``timeformat=unixtime``) or ISO-8601 strings.
+        :raises ValueError, KeyError, TypeError: on malformed payloads
+        """
+        offset = int(data["utc_offset_seconds"])
+        hourly = data["hourly"]
+        raw_times = hourly["time"]
+        times = array("q")
+        aware = False
+        if raw_times and isinstance(raw_times[0], str):
+            for value in raw_times:
+                seconds, aware = _epoch_seconds(value, offset)
+                times.append(seconds)
+        else:
+            times.extend(int(t) for t in raw_times)
+        elevation = data.get("elevation")
+        return cls(
+            latitude=float(data["latitude"]),
+            longitude=float(data["longitude"]),
+            generationtime_ms=float(data["generationtime_ms"]),
+            utc_offset_seconds=offset,
+            timezone=str(data["timezone"]),
+            timezone_abbreviation=str(data["timezone_abbreviation"]),
+            elevation=None if elevation is None else float(elevation),
+            times=times,
+            temperatures=array("d", hourly["temperature_2m"]),
+            weathercodes=array("h", hourly["weathercode"]),
+            aware=aware,
+        )
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def datetimes(self, times: Sequence[int] | None = None) -> List[datetime]:
+        """
+        Timestamps as the API reports them: UTC when the upstream sent
+        offsets, otherwise naive local time.
+        """
+        times = self.times if times is None else times
+        if self.aware:
+            return [datetime.fromtimestamp(t, timezone.utc) for t in times]
+        shift = self.utc_offset_seconds
+        return [_EPOCH + timedelta(seconds=t + shift) for t in times]
+
+    def window(
+        self, start: float | None = None, hours: int | None = None
+    ) -> "ForecastWindow":
+        """
+        The hours from ``start`` (epoch seconds; the beginning if None) on,
+        at most ``hours`` of them. The first index is found by binary search
+        on the sorted ``times`` column.
+        """
+        first = 0 if start is None else bisect_left(self.times, start)
+        last = len(self.times) if hours is None else min(first + hours, len(self))
+        return ForecastWindow(self, first, last)
+
+    def to_response(self) -> ForecastResponse:
+        """The forecast as the public pydantic model, built without validation."""
+        if self._response is None:
+            hourly = ForecastHourly.model_construct(
+                time=self.datetimes(),
+                temperature_2m=self.temperatures.tolist(),
+                weathercode=self.weathercodes.tolist(),
+            )
+            self._response = ForecastResponse.model_construct(
+                latitude=self.latitude,
+                longitude=self.longitude,
+                generationtime_ms=self.generationtime_ms,
+                utc_offset_seconds=self.utc_offset_seconds,
+                timezone=self.timezone,
+                timezone_abbreviation=self.timezone_abbreviation,
+                elevation=self.elevation,
+                hourly=hourly,
+            )
+        return self._response
+
+    @property
+    def version(self) -> str:
+        """
+        Digest of the ``to_json`` body, computed once: the same in every
+        worker for the same data, and different whenever any value changes.
+        """
+        if self._version is None:
+            self._version = hashlib.blake2b(self.to_json(), digest_size=16).hexdigest()
+        return self._version
+
+    def to_json(self) -> bytes:
+        """The ``ForecastResponse`` JSON body, serialized once and reused."""
+        if self._json is None:
+            self._json = self._render(self.times, self.temperatures, self.weathercodes)
+        return self._json
+
+    def _render(
+        self,
+        times: Sequence[int],
+        temperatures: Sequence[float],
+        weathercodes: Sequence[int],
+    ) -> bytes:
+        suffix = "Z" if self.aware else ""
+        if self.aware:
+            stamps = [_EPOCH + timedelta(seconds=t) for t in times]
+        else:
+            stamps = self.datetimes(times)
+        body = {
+            "latitude": self.latitude,
+            "longitude": self.longitude,
+            "generationtime_ms": self.generationtime_ms,
+            "utc_offset_seconds": self.utc_offset_seconds,
+            "timezone": self.timezone,
+            "timezone_abbreviation": self.timezone_abbreviation,
+            "elevation": self.elevation,
+            "hourly": {
+                "time": [dt.isoformat() + suffix for dt in stamps],
+                "temperature_2m": temperatures.tolist(),
+                "weathercode": weathercodes.tolist(),
+            },
+        }
+        return dumps(body)
+
+
+class ForecastWindow:
+    """
+    A contiguous range of a forecast's hours.
+
+    The columns are ``memoryview`` slices of the forecast's arrays, so
+    taking a window copies nothing.
+    """
+
+    __slots__ = ("forecast", "start", "stop")
+
+    def __init__(self, forecast: Forecast, start: int, stop: int):
+        self.forecast = forecast
+        self.start = start
+        self.stop = max(start, stop)
+
+    def __len__(self) -> int:
+        return self.stop - self.start
+
+    @property
+    def times(self) -> memoryview:
+        return memoryview(self.forecast.times)[self.start : self.stop]
+
+    @property
+    def temperatures(self) -> memoryview:
+        return memoryview(self.forecast.temperatures)[self.start : self.stop]
+
+    @property
+    def weathercodes(self) -> memoryview:
+        return memoryview(self.forecast.weathercodes)[self.start : self.stop]
+
+    def head(self, hours: int) -> "ForecastWindow":
+        """The first ``hours`` of this window."""
+        return ForecastWindow(
+            self.forecast, self.start, min(self.stop, self.start + hours)
+        )
+
+    def local_entries(self, tz: tzinfo) -> List[Tuple[datetime, float]]:
+        """(local time, temperature) pairs for rendering."""
+        return [
+            (datetime.fromtimestamp(t, tz), temp)
+            for t, temp in zip(self.times, self.temperatures)
+        ]
+
+    @property
+    def version(self) -> str:
+        """The forecast's version plus the hours in this window."""
+        return f"{self.forecast.version}[{self.start}:{self.stop}]"
+
+    def to_json(self) -> bytes:
+        """A ``ForecastResponse`` JSON body holding only these hours."""
+        if self.start == 0 and self.stop == len(self.forecast):
+            return self.forecast.to_json()
+        return self.forecast._render(self.times, self.temperatures, self.weathercodes)
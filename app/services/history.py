@@ -0,0 +1,230 @@
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Iterable
+
+from sqlalchemy import Select, and_, desc, func, literal, not_, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.models.search_history import SearchHistory
+
+__all__ = [
+    "HistoryWriter",
+    "history_writer",
+    "log_search",
+    "log_searches",
+    "history_suggestions_stmt",
+]
+
+logger = logging.getLogger(__name__)
+
+
+class HistoryWriter:
+    """
+    Write-behind buffer for SearchHistory rows.
+
+    Rows are queued by request handlers and inserted in batches by a single
+    background task, flushing whenever ``batch_size`` rows are pending or
+    ``flush_interval`` seconds have passed since the first pending row. The
+    queue is bounded, so producers wait (backpressure) once ``max_pending``
+    rows are buffered. ``stop`` flushes everything still queued.
+
+    A batch whose insert fails is retried up to ``retries`` times, after
+    ``retry_delay`` seconds and then twice as long each time, so a short
+    database outage loses nothing. While retrying, new rows keep queueing
+    and producers wait once the buffer is full; a longer outage drops the
+    batch rather than stall requests indefinitely, counting its rows in
+    ``dropped``. A commit that failed after the database applied it is
+    written twice: history tolerates a duplicate better than a gap.
+    """
+
+    def __init__(
+        self,
+        batch_size: int,
+        flush_interval: float,
+        max_pending: int,
+        retries: int = 0,
+        retry_delay: float = 0.5,
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.flushed = 0
+        self.batches = 0
+        self.retried = 0
+        self.dropped = 0
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Flush all queued rows and stop the background task."""
+        if not self.running:
+            return
+        task = self._task
+        await self._queue.put(None)
+        self._task = None
+        await task
+
+    async def record(self, user_id: int, city_name: str) -> None:
+        """
+        Queue one search for insertion, waiting if the buffer is full.
+        """
+        await self._queue.put(
+            {
+                "user_id": user_id,
+                "city_name": city_name,
+                "search_at": datetime.now(timezone.utc),
+            }
+        )
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            row = await self._queue.get()
+            if row is None:
+                break
+            batch = [row]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    row = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if row is None:
+                    stopping = True
+                    break
+                batch.append(row)
+            await self._flush(batch)
+
+    async def _flush(self, batch: list[dict]) -> None:
+        delay = self.retry_delay
+        for attempt in range(self.retries + 1):
+            try:
+                async with AsyncSessionLocal() as session:
+                    session.add_all([SearchHistory(**row) for row in batch])
+                    await session.commit()
+            except Exception:
+                if attempt == self.retries:
+                    self.dropped += len(batch)
+                    logger.exception("Dropped %d search history rows", len(batch))
+                    return
+                self.retried += 1
+                logger.warning(
+                    "Writing %d search history rows failed, retrying in %.1fs",
+                    len(batch),
+                    delay,
+                    exc_info=True,
+                )
+                await asyncio.sleep(delay)
+                delay *= 2
+            else:
+                self.flushed += len(batch)
+                self.batches += 1
+                return
+
+
+history_writer = HistoryWriter(
+    batch_size=settings.history_batch_size,
+    flush_interval=settings.history_flush_interval,
+    max_pending=settings.history_max_pending,
+    retries=settings.history_flush_retries,
+    retry_delay=settings.history_retry_delay,
+)
+
+
+async def log_search(session: AsyncSession, user_id: int, city_name: str) -> None:
+    """
+    Record a search, through ``history_writer`` when it is running, otherwise
+    inline on the request's session.
+    """
+    if history_writer.running:
+        await history_writer.record(user_id, city_name)
+        return
+    session.add(SearchHistory(user_id=user_id, city_name=city_name))
+    await session.commit()
+
+
+async def log_searches(
+    session: AsyncSession, user_id: int, city_names: Iterable[str]
+) -> None:
+    """
+    Record several searches at once, like ``log_search``; inline they are
+    inserted with one multi-row INSERT and a single commit.
+    """
+    if history_writer.running:
+        for city_name in city_names:
+            await history_writer.record(user_id, city_name)
+        return
+    session.add_all(
+        [SearchHistory(user_id=user_id, city_name=name) for name in city_names]
+    )
+    await session.commit()
+
+
+def _like_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _lower_city_name():
+    # Must match the expression indexes on lower(city_name) in PostgreSQL.
+    return func.lower(SearchHistory.city_name)
+
+
+def history_suggestions_stmt(user_id: int, query: str, per_kind: int = 5) -> Select:
+    """
+    The user's most searched cities matching ``query``, in one round-trip.
+
+    UNION ALL of two legs, each capped at ``per_kind`` rows and ordered by
+    search count: names starting with ``query`` (rank 0), then names
+    containing it elsewhere (rank 1). On PostgreSQL the prefix leg can use the
+    (user_id, lower(city_name) text_pattern_ops) index and the substring leg
+    the pg_trgm GIN index; SQLite runs the same SQL without them.
+    :return: statement yielding (city_name, freq) rows, prefix matches first
+    """
+    escaped = _like_escape(query.lower())
+    starts = _lower_city_name().like(escaped + "%", escape="\\")
+    contains = _lower_city_name().like("%" + escaped + "%", escape="\\")
+
+    def leg(rank: int, condition):
+        return (
+            select(
+                SearchHistory.city_name,
+                func.count().label("freq"),
+                literal(rank).label("rank"),
+            )
+            .filter(SearchHistory.user_id == user_id)
+            .filter(condition)
+            .group_by(SearchHistory.city_name)
+            .order_by(desc("freq"), SearchHistory.city_name)
+            .limit(per_kind)
+            .subquery()
+        )
+
+    prefix = leg(0, starts)
+    substring = leg(1, and_(contains, not_(starts)))
+    matches = union_all(select(prefix), select(substring)).subquery()
+    return select(matches.c.city_name, matches.c.freq).order_by(
+        matches.c.rank, desc(matches.c.freq), matches.c.city_name
+    )
@@ -0,0 +1,212 @@
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable
+
+__all__ = ["AdaptiveLimiter", "LimiterState", "LimiterTimeout"]
+
+_UNKNOWN = float("inf")
+
+
+class LimiterTimeout(Exception):
+    """
+    Raised when a call cannot be admitted before its queue deadline.
+    ``retry_after`` is the estimated wait in seconds, when one is known.
+    """
+
+    def __init__(self, message: str, retry_after: float | None = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+@dataclass(frozen=True)
+class LimiterState:
+    """
+    Point-in-time view of an AdaptiveLimiter, for metrics and debugging.
+    """
+
+    rate: float
+    tokens: float
+    in_flight: int
+    waiting: int
+    paused_for: float
+    admitted: int
+    rejected: int
+    throttled: int
+
+
+class AdaptiveLimiter:
+    """
+    Token bucket plus concurrency cap in front of an upstream API, with an
+    AIMD-adjusted rate.
+
+    A call is admitted once a token is available (refilled at ``rate`` per
+    second, up to ``burst``) and fewer than ``max_concurrency`` calls are in
+    flight. Callers queue in FIFO order for at most ``queue_timeout``
+    seconds; a caller that cannot be admitted in time, or whose estimated
+    wait is already past its deadline, gets LimiterTimeout.
+
+    Each success raises the rate by ``increase`` back towards ``max_rate``;
+    each throttled response multiplies it by ``backoff`` (not below
+    ``min_rate``), empties the bucket and, given a Retry-After, pauses all
+    admissions for that long (capped at ``max_pause``). Not thread-safe;
+    meant to be used from a single event loop.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int,
+        max_concurrency: int,
+        queue_timeout: float,
+        min_rate: float = 1.0,
+        increase: float = 0.1,
+        backoff: float = 0.5,
+        max_pause: float = 60.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.queue_timeout = queue_timeout
+        self.increase = increase
+        self.backoff = backoff
+        self.max_pause = max_pause
+        self.rate = rate
+        self.admitted = 0
+        self.rejected = 0
+        self.throttled = 0
+        self._clock = clock
+        self._tokens = float(burst)
+        self._refilled_at = clock()
+        self._paused_until = 0.0
+        self._in_flight = 0
+        self._queue: deque[object] = deque()
+        self._changed = asyncio.Event()
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def waiting(self) -> int:
+        return len(self._queue)
+
+    def state(self) -> LimiterState:
+        now = self._clock()
+        self._refill(now)
+        return LimiterState(
+            rate=self.rate,
+            tokens=self._tokens,
+            in_flight=self._in_flight,
+            waiting=len(self._queue),
+            paused_for=max(0.0, self._paused_until - now),
+            admitted=self.admitted,
+            rejected=self.rejected,
+            throttled=self.throttled,
+        )
+
+    async def acquire(self) -> None:
+        """
+        Wait for a slot; every successful call must be paired with
+        ``release``.
+        :raises LimiterTimeout: if no slot is free within ``queue_timeout``
+        """
+        now = self._clock()
+        deadline = now + self.queue_timeout
+        ticket = object()
+        self._queue.append(ticket)
+        try:
+            while True:
+                # Only the head of the queue may take a slot; the others wait
+                # to be woken, or until their deadline.
+                delay = _UNKNOWN
+                if self._queue[0] is ticket:
+                    delay = self._admission_delay(now)
+                    if delay == 0.0:
+                        self._admit()
+                        return
+                remaining = deadline - now
+                if remaining <= 0 or remaining < delay < _UNKNOWN:
+                    self.rejected += 1
+                    raise LimiterTimeout(
+                        "Too many upstream calls queued",
+                        retry_after=None if delay == _UNKNOWN else delay,
+                    )
+                await self._wait(min(delay, remaining))
+                now = self._clock()
+        finally:
+            self._queue.remove(ticket)
+            self._notify()
+
+    def try_acquire(self) -> bool:
+        """
+        Take a slot only if one is free right now and nobody is queued for
+        it; for optional calls that should not wait. Pair with ``release``.
+        """
+        if self._queue or self._admission_delay(self._clock()) > 0.0:
+            return False
+        self._admit()
+        return True
+
+    def release(self) -> None:
+        """Give back the slot taken by ``acquire``."""
+        self._in_flight -= 1
+        self._notify()
+
+    def on_success(self) -> None:
+        """Additive increase: an upstream call went through unthrottled."""
+        self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_throttle(self, retry_after: float | None = None) -> None:
+        """
+        Multiplicative decrease: upstream rejected a call for exceeding its
+        rate limit, optionally saying how long to wait.
+        """
+        self.throttled += 1
+        now = self._clock()
+        self._refill(now)
+        self.rate = max(self.min_rate, self.rate * self.backoff)
+        self._tokens = min(self._tokens, 0.0)
+        if retry_after is not None and retry_after > 0:
+            pause = min(retry_after, self.max_pause)
+            self._paused_until = max(self._paused_until, now + pause)
+        self._notify()
+
+    def _admit(self) -> None:
+        self._tokens -= 1.0
+        self._in_flight += 1
+        self.admitted += 1
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._refilled_at
+        if elapsed > 0:
+            self._tokens = min(float(self.burst), self._tokens + elapsed * self.rate)
+            self._refilled_at = now
+
+    def _admission_delay(self, now: float) -> float:
+        """
+        Seconds until a call could be admitted; _UNKNOWN while at the
+        concurrency cap, as that depends on when calls finish.
+        """
+        self._refill(now)
+        if self._in_flight >= self.max_concurrency:
+            return _UNKNOWN
+        wait = max(0.0, self._paused_until - now)
+        if self._tokens < 1.0:
+            wait = max(wait, (1.0 - self._tokens) / self.rate)
+        return wait
+
+    async def _wait(self, timeout: float) -> None:
+        changed = self._changed
+        try:
+            await asyncio.wait_for(changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def _notify(self) -> None:
+        # Wake every waiter; the one at the head of the queue re-checks.
+        self._changed.set()
+        self._changed = asyncio.Event()
@@ -0,0 +1,113 @@
+import random
+import time
+from collections import deque
+from typing import Callable
+
+__all__ = ["CircuitBreaker", "LatencyTracker", "decorrelated_jitter"]
+
+
+def decorrelated_jitter(previous: float, base: float, cap: float) -> float:
+    """
+    Next retry delay after sleeping ``previous`` seconds ("decorrelated
+    jitter"): random between ``base`` and three times the previous delay,
+    capped at ``cap``. Start with ``previous=base``.
+    """
+    return min(cap, random.uniform(base, previous * 3))
+
+
+class LatencyTracker:
+    """
+    Durations of the last ``window`` upstream calls, for percentile
+    estimates.
+    """
+
+    def __init__(self, window: int, min_samples: int):
+        self.min_samples = min_samples
+        self._samples: deque[float] = deque(maxlen=window)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def quantile(self, q: float) -> float | None:
+        """
+        The ``q`` quantile (0-1) of recent durations, or None until
+        ``min_samples`` have been recorded.
+        """
+        if len(self._samples) < max(self.min_samples, 1):
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def clear(self) -> None:
+        self._samples.clear()
+
+
+class CircuitBreaker:
+    """
+    Stops calling an upstream that keeps failing.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and
+    ``allow`` refuses calls for ``reset_timeout`` seconds. Then one trial
+    call is let through (half-open): a success closes the circuit, a
+    failure opens it again. If the trial never reports back, another is
+    allowed after a further ``reset_timeout``.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int,
+        reset_timeout: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened = 0
+        self.rejected = 0
+        self._clock = clock
+        self._open_until: float | None = None
+
+    @property
+    def state(self) -> str:
+        """One of closed, open, or half-open (a trial call may be made)."""
+        if self._open_until is None:
+            return "closed"
+        return "open" if self._clock() < self._open_until else "half-open"
+
+    @property
+    def retry_after(self) -> float | None:
+        """Seconds until the next trial call, while the circuit is open."""
+        if self._open_until is None:
+            return None
+        return max(0.0, self._open_until - self._clock())
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead now."""
+        if self._open_until is None:
+            return True
+        now = self._clock()
+        if now < self._open_until:
+            self.rejected += 1
+            return False
+        # Half-open: admit this call as the trial; hold the rest back.
+        self._open_until = now + self.reset_timeout
+        return True
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self._open_until = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self._open_until is not None or self.failures >= self.failure_threshold:
+            if self._open_until is None:
+                self.opened += 1
+            self._open_until = self._clock() + self.reset_timeout
+
+    def reset(self) -> None:
+        """Close the circuit and forget past failures."""
+        self.failures = 0
+        self._open_until = None
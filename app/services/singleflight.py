@@ -0,0 +1,90 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+T = TypeVar("T")
+
+__all__ = ["SingleFlight"]
+
+
+class _Flight:
+    __slots__ = ("task", "waiters", "cancellable")
+
+    def __init__(self, task: asyncio.Future, cancellable: bool):
+        self.task = task
+        self.waiters = 0
+        self.cancellable = cancellable
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls sharing a key onto one in-flight task.
+
+    The first caller for a key starts the work; callers arriving while it is
+    still running await the same task and receive the same result or
+    exception. The task is shielded, so a cancelled waiter (e.g. a client
+    that disconnected) does not cancel the call for everyone else.
+
+    A caller passing ``cancellable=True`` allows the task to be cancelled
+    once every waiter has been cancelled, provided all of them allowed it;
+    otherwise the task runs to completion with nobody waiting.
+    """
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.coalesced = 0
+        self.abandoned = 0
+        self._inflight: Dict[Hashable, _Flight] = {}
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._inflight
+
+    async def do(
+        self,
+        key: Hashable,
+        fn: Callable[[], Awaitable[T]],
+        cancellable: bool = False,
+    ) -> T:
+        flight = self._join(key, fn, cancellable)
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if not flight.waiters and flight.cancellable and not flight.task.done():
+                self.abandoned += 1
+                flight.task.cancel()
+
+    def start(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> asyncio.Future:
+        """
+        Start ``fn`` for ``key`` unless a call is already in flight, without
+        waiting for it, and return the in-flight task. Starting happens
+        immediately, so callers arriving later in the same step coalesce onto
+        it. Waiters of such a task never cancel it.
+        """
+        flight = self._join(key, fn, cancellable=False)
+        return flight.task
+
+    def _join(
+        self, key: Hashable, fn: Callable[[], Awaitable[T]], cancellable: bool
+    ) -> _Flight:
+        flight = self._inflight.get(key)
+        if flight is None:
+            self.calls += 1
+            flight = _Flight(asyncio.ensure_future(fn()), cancellable)
+            self._inflight[key] = flight
+            flight.task.add_done_callback(lambda t: self._forget(key, t))
+        else:
+            self.coalesced += 1
+            flight.cancellable = flight.cancellable and cancellable
+        return flight
+
+    def _forget(self, key: Hashable, task: asyncio.Future) -> None:
+        flight = self._inflight.get(key)
+        if flight is not None and flight.task is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved even if every waiter went away.
+            task.exception()
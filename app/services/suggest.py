@@ -0,0 +1,139 @@
+import asyncio
+from typing import AsyncIterator, Iterable, List
+
+import httpx
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.schemas.weather import City
+from app.services.history import history_suggestions_stmt
+from app.services.weather import WeatherServiceError, search_city
+
+__all__ = [
+    "history_suggestions",
+    "merge_suggestions",
+    "blended_suggestions",
+    "streamed_suggestions",
+]
+
+
+async def history_suggestions(
+    session: AsyncSession, user_id: int | None, query: str
+) -> List[City]:
+    """
+    Cities from the user's own history matching ``query``, prefix matches first.
+    """
+    if user_id is None:
+        return []
+    rows = (await session.execute(history_suggestions_stmt(user_id, query))).all()
+    return [City(name=name) for name, freq in rows]
+
+
+def merge_suggestions(*sources: Iterable[City], limit: int) -> List[City]:
+    """
+    Concatenate suggestion lists, dropping repeated names, up to ``limit``.
+    """
+    seen = set()
+    merged: List[City] = []
+    for src in sources:
+        for city in src:
+            if len(merged) >= limit:
+                return merged
+            if city.name not in seen:
+                seen.add(city.name)
+                merged.append(city)
+    return merged
+
+
+def _consume_result(task: asyncio.Future) -> None:
+    if not task.cancelled():
+        task.exception()
+
+
+async def blended_suggestions(
+    session: AsyncSession,
+    user_id: int | None,
+    query: str,
+    limit: int,
+    client: httpx.AsyncClient | None = None,
+) -> List[City]:
+    """
+    History matches followed by Open-Meteo geocoding results, deduplicated.
+
+    The history query and the geocoding call run concurrently. If geocoding
+    has not answered within ``suggest_upstream_deadline`` seconds, or fails
+    while history has matches, only history suggestions are returned; the
+    upstream call keeps running in the background and fills the geocoding
+    cache for the next keystroke.
+    :raises WeatherServiceError: if geocoding fails and history has no matches.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.suggest_upstream_deadline
+    upstream = asyncio.ensure_future(
+        search_city(query, max_results=limit, client=client)
+    )
+    upstream.add_done_callback(_consume_result)
+
+    try:
+        history = await history_suggestions(session, user_id, query)
+    except BaseException:
+        upstream.cancel()
+        raise
+
+    try:
+        api = await asyncio.wait_for(
+            asyncio.shield(upstream), timeout=max(deadline - loop.time(), 0)
+        )
+    except asyncio.TimeoutError:
+        api = []
+    except WeatherServiceError:
+        if not history:
+            raise
+        api = []
+
+    return merge_suggestions(history, api, limit=limit)
+
+
+async def streamed_suggestions(
+    session: AsyncSession,
+    user_id: int | None,
+    query: str,
+    limit: int,
+    client: httpx.AsyncClient | None = None,
+    upstream_delay: float = 0.0,
+) -> AsyncIterator[List[City]]:
+    """
+    Suggestions in batches, best source first: the user's history matches
+    (always yielded, possibly empty) as soon as the database answers, then
+    the geocoding results not already sent.
+
+    Geocoding runs alongside the history query, starting after
+    ``upstream_delay`` seconds (at once by default), and is awaited without
+    a deadline. Closing the
+    generator early cancels it, aborting the upstream call unless another
+    request is waiting for the same one. The session is only used before
+    the first batch is yielded.
+    :raises WeatherServiceError: from the second batch, if geocoding fails.
+    """
+
+    async def lookup() -> List[City]:
+        if upstream_delay > 0:
+            await asyncio.sleep(upstream_delay)
+        return await search_city(
+            query, max_results=limit, client=client, cancellable=True
+        )
+
+    upstream = asyncio.ensure_future(lookup())
+    upstream.add_done_callback(_consume_result)
+    try:
+        history = merge_suggestions(
+            await history_suggestions(session, user_id, query), limit=limit
+        )
+        yield history
+        if len(history) < limit:
+            api = await upstream
+            extra = merge_suggestions(history, api, limit=limit)[len(history) :]
+            if extra:
+                yield extra
+    finally:
+        upstream.cancel()
@@ -0,0 +1,66 @@
+from dataclasses import dataclass
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.user import User
+from app.services.cache import TTLCache
+
+__all__ = ["CurrentUser", "user_cache", "unknown_cookies", "ensure_user"]
+
+
+@dataclass
+class CurrentUser:
+    """
+    The anonymous visitor behind a request, as attached to request.state.user.
+    """
+
+    cookie_id: str
+    id: int | None = None
+    """Primary key of the users row, or None until the visitor first writes."""
+
+
+# cookie_id -> users.id for visitors that have a users row
+user_cache: TTLCache[str, int] = TTLCache(
+    maxsize=settings.user_cache_max_entries, ttl=settings.user_cache_ttl
+)
+
+# Cookies recently found to have no users row. Kept briefly and apart from
+# user_cache: another worker may create the row at any moment, and one-off
+# cookieless clients must not push real users out of user_cache.
+unknown_cookies: TTLCache[str, bool] = TTLCache(
+    maxsize=settings.unknown_cookie_cache_max_entries,
+    ttl=settings.unknown_cookie_cache_ttl,
+)
+
+
+async def ensure_user(session: AsyncSession, user: CurrentUser) -> int:
+    """
+    Return the visitor's user id, inserting the users row on first use.
+
+    Only endpoints that write history call this, so visitors who merely browse
+    never cost an INSERT.
+    :return: users.id for the visitor's cookie
+    """
+    if user.id is not None:
+        return user.id
+
+    stmt = select(User.id).filter_by(cookie_id=user.cookie_id)
+    user_id = (await session.execute(stmt)).scalar_one_or_none()
+    if user_id is None:
+        row = User(cookie_id=user.cookie_id)
+        session.add(row)
+        try:
+            await session.commit()
+            user_id = row.id
+        except IntegrityError:
+            # Another worker created the same cookie concurrently.
+            await session.rollback()
+            user_id = (await session.execute(stmt)).scalar_one()
+
+    user.id = user_id
+    user_cache.set(user.cookie_id, user_id)
+    unknown_cookies.pop(user.cookie_id)
+    return user_id
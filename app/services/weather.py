@@ -1,85 +1,834 @@
-from typing import List, Tuple
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from datetime import timezone
+from email.utils import parsedate_to_datetime
+from typing import (
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Hashable,
+    List,
+    NamedTuple,
+    NoReturn,
+    Sequence,
+    Set,
+    Tuple,
+    TypeVar,
+    Union,
+)
 
 import httpx
 from httpx import RequestError
 
+from app.core.config import settings
+from app.core.fastjson import loads
+from app.geo import CityIndex
 from app.schemas.weather import City, ForecastResponse, GeocodingResponse
+from app.services.cache import Cache, TTLCache
+from app.services.forecast import Forecast
+from app.services.ratelimit import AdaptiveLimiter, LimiterTimeout
+from app.services.resilience import (
+    CircuitBreaker,
+    LatencyTracker,
+    decorrelated_jitter,
+)
+from app.services.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
 
 GEOCODING_API_URL = "https://geocoding-api.open-meteo.com/v1/search"
 FORECAST_API_URL = "https://api.open-meteo.com/v1/forecast"
 
+# Rough per-hour footprint of a cached forecast: the three array columns
+# plus its serialized JSON body
+_HOURLY_ENTRY_BYTES = 64
+_FORECAST_BASE_BYTES = 1024
+
+ForecastKey = Tuple[int, int]
+
+
+def _forecast_size(forecast: Forecast) -> int:
+    return _FORECAST_BASE_BYTES + _HOURLY_ENTRY_BYTES * len(forecast)
+
+
+forecast_cache: Cache[ForecastKey, Forecast] = TTLCache(
+    maxsize=settings.forecast_cache_max_entries,
+    ttl=settings.forecast_cache_ttl,
+    max_bytes=settings.forecast_cache_max_bytes,
+    sizeof=_forecast_size,
+    stale_ttl=settings.forecast_stale_ttl,
+)
+
+
+class GeocodingResult(NamedTuple):
+    """
+    Cities returned for one query, and how many were asked for.
+    """
+
+    cities: List[City]
+    requested: int
+
+    @property
+    def complete(self) -> bool:
+        """True if upstream returned every match rather than a truncated list."""
+        return len(self.cities) < self.requested
+
+
+def normalize_query(name: str) -> str:
+    return " ".join(name.split()).casefold()
+
+
+class GeocodingCache:
+    """
+    Memoizes geocoding results per normalized query.
+
+    A longer query can be answered from a cached shorter prefix whose result
+    set was not truncated, by filtering it on the city name. Expired results
+    are kept ``stale_ttl`` longer for ``get_stale``.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float,
+        prefix_min_length: int,
+        stale_ttl: float = 0.0,
+    ):
+        self.prefix_min_length = prefix_min_length
+        self.prefix_hits = 0
+        self._cache: TTLCache[str, GeocodingResult] = TTLCache(
+            maxsize=maxsize, ttl=ttl, stale_ttl=stale_ttl
+        )
+
+    @property
+    def stats(self):
+        return self._cache.stats
+
+    def get(self, query: str, max_results: int) -> List[City] | None:
+        """
+        Return up to ``max_results`` cities for ``query``, or None on a miss.
+        """
+        key = normalize_query(query)
+        cached = self._cache.get(key)
+        if cached is not None and (cached.complete or cached.requested >= max_results):
+            return cached.cities[:max_results]
+
+        for end in range(len(key) - 1, self.prefix_min_length - 1, -1):
+            shorter = self._cache.peek(key[:end])
+            if shorter is None or not shorter.complete:
+                continue
+            cities = [
+                c for c in shorter.cities if normalize_query(c.name).startswith(key)
+            ]
+            self._cache.set(key, GeocodingResult(cities, shorter.requested))
+            self.prefix_hits += 1
+            return cities[:max_results]
+        return None
+
+    def get_stale(self, query: str, max_results: int) -> List[City] | None:
+        """
+        Like ``get`` for an exact query, but also returning expired results;
+        a fallback for when upstream cannot be reached.
+        """
+        cached = self._cache.lookup(normalize_query(query))
+        if cached is None:
+            return None
+        result = cached.value
+        if result.complete or result.requested >= max_results:
+            return result.cities[:max_results]
+        return None
+
+    def set(self, query: str, max_results: int, cities: List[City]) -> None:
+        self._cache.set(normalize_query(query), GeocodingResult(cities, max_results))
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+
+geocoding_cache = GeocodingCache(
+    maxsize=settings.geocode_cache_max_entries,
+    ttl=settings.geocode_cache_ttl,
+    prefix_min_length=settings.geocode_prefix_min_length,
+    stale_ttl=settings.geocode_stale_ttl,
+)
+
+# Offline city index, loaded at startup when settings.gazetteer_path is set
+gazetteer: CityIndex | None = None
+
 
 class WeatherServiceError(Exception):
     """Generic exception for weather service errors."""
 
 
+class UpstreamUnavailableError(WeatherServiceError):
+    """
+    Open-Meteo cannot be called right now: its circuit breaker is open.
+    ``retry_after`` is the suggested wait in seconds, if known.
+    """
+
+    def __init__(self, message: str, retry_after: float | None = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class UpstreamRateLimitError(UpstreamUnavailableError):
+    """
+    Open-Meteo rate-limited us, or ``upstream_limiter`` could not admit the
+    call in time.
+    """
+
+
+T = TypeVar("T")
+
+# Concurrent identical upstream calls share one request.
+upstream_flights = SingleFlight()
+
+# Paces every Open-Meteo call made by this process.
+upstream_limiter = AdaptiveLimiter(
+    rate=settings.upstream_rate,
+    burst=settings.upstream_burst,
+    max_concurrency=settings.upstream_max_concurrency,
+    queue_timeout=settings.upstream_queue_timeout,
+    min_rate=settings.upstream_min_rate,
+    increase=settings.upstream_rate_increase,
+    backoff=settings.upstream_backoff,
+    max_pause=settings.upstream_max_retry_after,
+)
+
+# Per-API circuit breakers and recent latencies (for hedging), keyed by
+# the API name used in error messages.
+upstream_breakers: Dict[str, CircuitBreaker] = {
+    api: CircuitBreaker(
+        failure_threshold=settings.upstream_breaker_threshold,
+        reset_timeout=settings.upstream_breaker_reset,
+    )
+    for api in ("Geocoding", "Forecast")
+}
+upstream_latency: Dict[str, LatencyTracker] = {
+    api: LatencyTracker(
+        window=settings.upstream_latency_window,
+        min_samples=settings.upstream_hedge_min_samples,
+    )
+    for api in ("Geocoding", "Forecast")
+}
+
+# Gateway errors and overload: worth retrying an idempotent GET.
+_RETRY_STATUSES = frozenset({502, 503, 504})
+
+
+@dataclass
+class UpstreamStats:
+    """
+    Counters for the retry and hedging layer around Open-Meteo calls.
+    """
+
+    retries: int = 0
+    hedges: int = 0
+    hedge_wins: int = 0
+
+
+upstream_stats = UpstreamStats()
+
+# Strong references to background refreshes so they are not garbage collected.
+_refresh_tasks: Set[asyncio.Task] = set()
+
+
+async def _coalesce(
+    key: Hashable, fn: Callable[[], Awaitable[T]], cancellable: bool = False
+) -> T:
+    """
+    Run ``fn`` through ``upstream_flights``, surfacing any failure to every
+    waiter as a WeatherServiceError. See ``SingleFlight.do`` for
+    ``cancellable``.
+    """
+
+    return await upstream_flights.do(key, _as_service_call(fn), cancellable=cancellable)
+
+
+def _as_service_call(fn: Callable[[], Awaitable[T]]) -> Callable[[], Awaitable[T]]:
+    async def call() -> T:
+        try:
+            return await fn()
+        except WeatherServiceError:
+            raise
+        except Exception as e:
+            raise WeatherServiceError(f"Upstream call failed: {e}") from e
+
+    return call
+
+
+@asynccontextmanager
+async def _use_client(
+    client: httpx.AsyncClient | None,
+) -> AsyncIterator[httpx.AsyncClient]:
+    """
+    Yield the shared client if one was injected, otherwise a short-lived one
+    that is closed on exit.
+    """
+    if client is not None:
+        yield client
+        return
+    async with httpx.AsyncClient(timeout=5.0) as own_client:
+        yield own_client
+
+
 async def search_city(
-    name: str, max_results: int = 15, client: httpx.AsyncClient | None = None
+    name: str,
+    max_results: int = 15,
+    client: httpx.AsyncClient | None = None,
+    cancellable: bool = False,
 ) -> List[City]:
     """
-    Call the Open-Meteo geocoding API to autocomplete city names.
+    Autocomplete city names, answering from the local ``gazetteer`` or
+    ``geocoding_cache`` when possible, and from expired cache entries when
+    the geocoding API fails.
+
+    By default an upstream call runs to completion (filling the cache) even
+    if the caller is cancelled; with ``cancellable`` it is aborted once no
+    caller is waiting for it any more.
     :raises WeatherServiceError: on HTTP errors (with generic message for JSON errors,
       raw text for non-JSON), or on network/request errors.
     """
-    own_client = client or httpx.AsyncClient(timeout=5.0)
+    if gazetteer is not None:
+        cities = gazetteer.search(name, max_results)
+        if cities:
+            return cities
+
+    cities = geocoding_cache.get(name, max_results)
+    if cities is not None:
+        return cities
+
+    async def fetch() -> List[City]:
+        fetched = await _request_cities(name, max_results, client)
+        geocoding_cache.set(name, max_results, fetched)
+        return fetched
+
     try:
-        resp = await own_client.get(
-            GEOCODING_API_URL, params={"name": name, "count": max_results}
+        return await _coalesce(
+            ("geocode", normalize_query(name), max_results), fetch, cancellable
         )
-        if resp.status_code >= 400:
-            try:
-                resp.json()
-            except ValueError:
-                raise WeatherServiceError(resp.text)
-            else:
-                raise WeatherServiceError(
-                    f"Geocoding API returned HTTP {resp.status_code}"
-                )
-
-        data = GeocodingResponse.model_validate(resp.json())
-        return data.results
-
     except WeatherServiceError:
-        raise
-    except RequestError as e:
-        raise WeatherServiceError(f"Error requesting Geocoding API: {e}") from e
-    except Exception as e:
-        raise WeatherServiceError(f"Geocoding failed: {e}") from e
+        # Upstream is failing: an expired answer beats none.
+        stale = geocoding_cache.get_stale(name, max_results)
+        if stale is None:
+            raise
+        logger.warning("Geocoding failed, serving stale results for %r", name)
+        return stale
+
+
+async def _request_cities(
+    name: str, max_results: int, client: httpx.AsyncClient | None
+) -> List[City]:
+    """
+    Call the Open-Meteo geocoding API to autocomplete city names.
+    """
+    async with _use_client(client) as http:
+        try:
+            resp = await _upstream_get(
+                http,
+                GEOCODING_API_URL,
+                {"name": name, "count": max_results},
+                "Geocoding",
+            )
+            if resp.status_code >= 400:
+                _raise_upstream_error(resp, "Geocoding")
+
+            data = GeocodingResponse.model_validate_json(resp.content)
+            return data.results
+
+        except WeatherServiceError:
+            raise
+        except RequestError as e:
+            raise WeatherServiceError(f"Error requesting Geocoding API: {e}") from e
+        except Exception as e:
+            raise WeatherServiceError(f"Geocoding failed: {e}") from e
+
+
+async def _upstream_get(
+    http: httpx.AsyncClient, url: str, params: dict, api: str
+) -> httpx.Response:
+    """
+    GET an Open-Meteo endpoint, guarded by the ``api``'s circuit breaker.
+
+    Network errors and 502/503/504 answers are retried up to
+    ``upstream_retries`` times with decorrelated-jitter sleeps. A network
+    error or any 5xx answer left after that counts as a failure for the
+    breaker. While the circuit
+    is open the call fails fast with UpstreamUnavailableError.
+    :raises UpstreamUnavailableError: while the circuit is open, or if
+      throttled (UpstreamRateLimitError)
+    :raises httpx.RequestError: on network errors
+    """
+    breaker = upstream_breakers[api]
+    if not breaker.allow():
+        raise UpstreamUnavailableError(
+            f"{api} API is unavailable, try again later", breaker.retry_after
+        )
+
+    delay = settings.upstream_retry_base_delay
+    for attempt in range(settings.upstream_retries + 1):
+        if attempt:
+            upstream_stats.retries += 1
+            delay = decorrelated_jitter(
+                delay,
+                settings.upstream_retry_base_delay,
+                settings.upstream_retry_max_delay,
+            )
+            await asyncio.sleep(delay)
+        try:
+            resp = await _hedged_get(http, url, params, api)
+        except RequestError:
+            if attempt == settings.upstream_retries:
+                breaker.record_failure()
+                raise
+            continue
+        if resp.status_code not in _RETRY_STATUSES:
+            break
+    # Any 5xx left means upstream is failing; 4xx answers show it is up.
+    if resp.status_code >= 500:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+    return resp
+
+
+async def _hedged_get(
+    http: httpx.AsyncClient, url: str, params: dict, api: str
+) -> httpx.Response:
+    """
+    One attempt, hedged: with ``upstream_hedge`` on, if the request is still
+    running after the recent ``upstream_hedge_quantile`` latency, a second
+    one is sent (only if the limiter has a slot free right now) and the
+    first to answer wins.
+    """
+    tasks = {asyncio.ensure_future(_limited_get(http, url, params, api))}
+    hedge: asyncio.Future | None = None
+    try:
+        hedge_after = _hedge_delay(api)
+        if hedge_after is not None:
+            done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+            limiter = upstream_limiter
+            if not done and limiter.try_acquire():
+                upstream_stats.hedges += 1
+                hedge = asyncio.ensure_future(_send(limiter, http, url, params, api))
+                # A callback, so the slot is returned even if the task is
+                # cancelled before it starts.
+                hedge.add_done_callback(lambda _: limiter.release())
+                tasks.add(hedge)
+
+        error: BaseException | None = None
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                if task.exception() is None:
+                    if task is hedge:
+                        upstream_stats.hedge_wins += 1
+                    return task.result()
+                error = error or task.exception()
+        raise error
     finally:
-        if client is None:
-            await own_client.aclose()
+        for task in tasks:
+            task.cancel()
+        # Collect the losers, so one that had already failed is not reported
+        # as "Task exception was never retrieved".
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def _hedge_delay(api: str) -> float | None:
+    if not settings.upstream_hedge:
+        return None
+    latency = upstream_latency[api].quantile(settings.upstream_hedge_quantile)
+    if latency is None:
+        return None
+    return max(latency, settings.upstream_hedge_min_delay)
 
 
-async def get_forecast(lat: float, lon: float) -> ForecastResponse:
+async def _limited_get(
+    http: httpx.AsyncClient, url: str, params: dict, api: str
+) -> httpx.Response:
     """
-    Call the Open-Meteo Forecast API for hourly temperature and weather code.
+    One GET through ``upstream_limiter``, waiting in its queue for a slot.
+    :raises UpstreamRateLimitError: if throttled, here or by upstream
+    """
+    limiter = upstream_limiter
+    try:
+        await limiter.acquire()
+    except LimiterTimeout as e:
+        raise UpstreamRateLimitError(
+            f"{api} API is busy, try again later", e.retry_after
+        ) from e
+    try:
+        return await _send(limiter, http, url, params, api)
+    finally:
+        limiter.release()
+
+
+async def _send(
+    limiter: AdaptiveLimiter,
+    http: httpx.AsyncClient,
+    url: str,
+    params: dict,
+    api: str,
+) -> httpx.Response:
+    """
+    Make a GET in a slot the caller holds from ``limiter``. Successful
+    answers let the limiter speed up again and feed the latency samples;
+    a 429 slows it down, pausing for the Retry-After period.
+    """
+    started = time.monotonic()
+    resp = await http.get(url, params=params)
+
+    if resp.status_code == 429:
+        retry_after = _parse_retry_after(resp.headers.get("Retry-After"))
+        limiter.on_throttle(retry_after)
+        raise UpstreamRateLimitError(f"{api} API rate limit exceeded", retry_after)
+    if resp.status_code < 400:
+        limiter.on_success()
+        upstream_latency[api].record(time.monotonic() - started)
+    return resp
+
+
+def _parse_retry_after(value: str | None) -> float | None:
+    """Seconds to wait from a Retry-After header: delta-seconds or an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, when.timestamp() - time.time())
+
+
+def _raise_upstream_error(resp: httpx.Response, api: str) -> NoReturn:
+    """
+    Turn an upstream error response into WeatherServiceError: a generic
+    message for JSON bodies, the raw text otherwise.
+    """
+    try:
+        loads(resp.content)
+    except ValueError:
+        raise WeatherServiceError(resp.text)
+    raise WeatherServiceError(f"{api} API returned HTTP {resp.status_code}")
+
+
+def forecast_cache_key(lat: float, lon: float) -> ForecastKey:
+    """
+    Snap coordinates to the configured grid so nearby lookups share an entry.
+    """
+    grid = settings.forecast_cache_grid
+    return round(lat / grid), round(lon / grid)
+
+
+async def get_forecast(
+    lat: float, lon: float, client: httpx.AsyncClient | None = None
+) -> ForecastResponse:
+    """
+    Return the hourly forecast for a location as a ``ForecastResponse``.
+    See ``load_forecast``.
+    :raises WeatherServiceError: on HTTP errors (generic for JSON, raw text otherwise),
+      or on network/request errors.
+    """
+    forecast = await load_forecast(lat, lon, client=client)
+    return forecast.to_response()
+
+
+async def load_forecast(
+    lat: float, lon: float, client: httpx.AsyncClient | None = None
+) -> Forecast:
+    """
+    Return the hourly forecast for a location, served from ``forecast_cache``
+    when an entry exists for the surrounding grid cell.
+
+    An expired entry still inside the ``forecast_stale_ttl`` window is
+    returned immediately while a background task refreshes it, so upstream
+    latency and upstream failures are hidden until the entry is too old.
     :raises WeatherServiceError: on HTTP errors (generic for JSON, raw text otherwise),
       or on network/request errors.
     """
+    key = forecast_cache_key(lat, lon)
+    flight_key = ("forecast", key)
+    cached = forecast_cache.lookup(key)
+    if cached is not None and cached.fresh:
+        return cached.value
+
+    async def fetch() -> Forecast:
+        fetched = await _request_forecast(lat, lon, client)
+        forecast_cache.set(key, fetched)
+        return fetched
+
+    if cached is None:
+        return await _coalesce(flight_key, fetch)
+
+    if flight_key not in upstream_flights:
+        task = asyncio.create_task(_refresh_forecast(flight_key, fetch))
+        _refresh_tasks.add(task)
+        task.add_done_callback(_refresh_tasks.discard)
+    return cached.value
+
+
+async def _refresh_forecast(
+    flight_key: Hashable, fetch: Callable[[], Awaitable[Forecast]]
+) -> None:
+    try:
+        await _coalesce(flight_key, fetch)
+    except WeatherServiceError as e:
+        logger.warning("Background forecast refresh failed: %s", e)
+
+
+async def _request_forecast(
+    lat: float, lon: float, client: httpx.AsyncClient | None
+) -> Forecast:
+    """
+    Call the Open-Meteo Forecast API for hourly temperature and weather code.
+    Timestamps are requested as unix seconds so they need no parsing.
+    """
+    forecasts = await _request_forecasts([(lat, lon)], client)
+    return forecasts[0]
+
+
+async def _request_forecasts(
+    coords: Sequence[Tuple[float, float]], client: httpx.AsyncClient | None
+) -> List[Forecast]:
+    """
+    Fetch several locations in one Forecast API call, using its
+    multi-location form (comma-separated latitudes and longitudes).
+    :return: one forecast per coordinate pair, in order
+    """
     params = {
-        "latitude": lat,
-        "longitude": lon,
+        "latitude": ",".join(str(lat) for lat, _ in coords),
+        "longitude": ",".join(str(lon) for _, lon in coords),
         "hourly": "temperature_2m,weathercode",
         "current_weather": True,
         "timezone": "auto",
+        "timeformat": "unixtime",
     }
-    async with httpx.AsyncClient(timeout=5.0) as client:
+    async with _use_client(client) as http:
         try:
-            resp = await client.get(FORECAST_API_URL, params=params)
+            resp = await _upstream_get(http, FORECAST_API_URL, params, "Forecast")
         except RequestError as e:
             raise WeatherServiceError(f"Error requesting Forecast API: {e}") from e
 
         if resp.status_code >= 400:
-            try:
-                resp.json()
-            except ValueError:
-                raise WeatherServiceError(resp.text)
-            else:
-                raise WeatherServiceError(
-                    f"Forecast API returned HTTP {resp.status_code}"
-                )
+            _raise_upstream_error(resp, "Forecast")
+
+        data = loads(resp.content)
+        # A single location comes back as an object, several as a list.
+        payloads = [data] if isinstance(data, dict) else data
+        if len(payloads) != len(coords):
+            raise WeatherServiceError(
+                f"Forecast API returned {len(payloads)} locations"
+                f" for {len(coords)} requested"
+            )
+        return [Forecast.from_payload(payload) for payload in payloads]
+
+
+class BatchResult(NamedTuple):
+    """
+    Outcome for one location of ``load_weather_batch``: the resolved city
+    (None for coordinates) and its forecast, or an error message.
+    """
+
+    city: City | None
+    forecast: Forecast | None
+    error: str | None = None
+
+
+Location = Union[str, Tuple[float, float]]
+
+
+async def load_weather_batch(
+    locations: Sequence[Location], client: httpx.AsyncClient | None = None
+) -> List[BatchResult]:
+    """
+    Resolve and fetch the weather for many locations, given as city names
+    (autocompleted to their first match) or (latitude, longitude) pairs.
+
+    Names are resolved concurrently, at most ``weather_batch_concurrency``
+    at a time, and the forecasts loaded with ``load_forecasts``. A location
+    that fails gets an error in its result instead of failing the batch.
+    :return: one result per location, in order
+    """
+    names = list(dict.fromkeys(loc for loc in locations if isinstance(loc, str)))
+    limit = asyncio.Semaphore(settings.weather_batch_concurrency)
+
+    async def resolve(name: str) -> City:
+        async with limit:
+            cities = await search_city(name, max_results=1, client=client)
+        if not cities:
+            raise WeatherServiceError(f"No matching city for '{name}'")
+        return cities[0]
+
+    resolved = await asyncio.gather(
+        *(resolve(name) for name in names), return_exceptions=True
+    )
+    for outcome in resolved:
+        if isinstance(outcome, BaseException) and not isinstance(
+            outcome, WeatherServiceError
+        ):
+            raise outcome
+    by_name = dict(zip(names, resolved))
+
+    cities: List[City | None] = []
+    coords: List[Tuple[float, float]] = []
+    results: List[BatchResult | None] = []
+    for loc in locations:
+        if isinstance(loc, str):
+            city = by_name[loc]
+            if isinstance(city, WeatherServiceError):
+                results.append(BatchResult(None, None, str(city)))
+                continue
+            cities.append(city)
+            coords.append((city.latitude, city.longitude))
+        else:
+            cities.append(None)
+            coords.append(loc)
+        results.append(None)
+
+    forecasts = iter(zip(cities, await load_forecasts(coords, client=client)))
+    for i, result in enumerate(results):
+        if result is not None:
+            continue
+        city, forecast = next(forecasts)
+        if isinstance(forecast, WeatherServiceError):
+            results[i] = BatchResult(city, None, str(forecast))
+        else:
+            results[i] = BatchResult(city, forecast)
+    return results
+
+
+async def load_forecasts(
+    coords: Sequence[Tuple[float, float]], client: httpx.AsyncClient | None = None
+) -> List[Forecast | WeatherServiceError]:
+    """
+    Load forecasts for many locations at once, in order.
+
+    Cached entries are used as in ``load_forecast``: stale ones are returned
+    and refreshed in the background. The rest are fetched with multi-location
+    requests of up to ``forecast_batch_locations`` coordinates each, at most
+    ``weather_batch_concurrency`` of them in flight. Locations sharing a grid
+    cell are fetched once. A failed request yields its WeatherServiceError
+    for each of its locations rather than raising.
+    """
+    found: Dict[ForecastKey, Forecast | WeatherServiceError] = {}
+    missing: Dict[ForecastKey, Tuple[float, float]] = {}
+    stale: Dict[ForecastKey, Tuple[float, float]] = {}
+    for lat, lon in coords:
+        key = forecast_cache_key(lat, lon)
+        if key in found or key in missing:
+            continue
+        cached = forecast_cache.lookup(key)
+        if cached is None:
+            missing[key] = (lat, lon)
+            continue
+        found[key] = cached.value
+        if not cached.fresh and ("forecast", key) not in upstream_flights:
+            stale[key] = (lat, lon)
+
+    if stale:
+        task = asyncio.create_task(_refresh_forecasts(stale, client))
+        _refresh_tasks.add(task)
+        task.add_done_callback(_refresh_tasks.discard)
+
+    if missing:
+        found.update(await _fetch_forecasts(missing, client))
+    return [found[forecast_cache_key(lat, lon)] for lat, lon in coords]
+
+
+async def _fetch_forecasts(
+    locations: Dict[ForecastKey, Tuple[float, float]],
+    client: httpx.AsyncClient | None,
+) -> Dict[ForecastKey, Forecast | WeatherServiceError]:
+    """
+    Fetch uncached forecasts in multi-location chunks. Each location is
+    registered in ``upstream_flights`` under the key ``load_forecast`` uses,
+    so a location already being fetched (singly or by another batch) is
+    joined rather than requested again, and later single fetches join the
+    chunk holding their location.
+    """
+    size = settings.forecast_batch_locations
+    limit = asyncio.Semaphore(settings.weather_batch_concurrency)
+    pending = [
+        (key, coords)
+        for key, coords in locations.items()
+        if ("forecast", key) not in upstream_flights
+    ]
+
+    async def request(coords: List[Tuple[float, float]]) -> List[Forecast]:
+        async with limit:
+            return await _request_forecasts(coords, client)
+
+    def take(chunk: asyncio.Future, index: int, key: ForecastKey):
+        async def fetch() -> Forecast:
+            forecast = (await chunk)[index]
+            forecast_cache.set(key, forecast)
+            return forecast
+
+        return fetch
+
+    def fetch_one(key: ForecastKey, lat: float, lon: float):
+        # For keys already in flight ``start`` joins the running call, so
+        # this is a fallback only.
+        async def fetch() -> Forecast:
+            forecast = await _request_forecast(lat, lon, client)
+            forecast_cache.set(key, forecast)
+            return forecast
+
+        return fetch
 
-        return ForecastResponse.model_validate(resp.json())
+    # No awaits from the membership check above until every flight is
+    # registered, so no other call can slip in between.
+    fetches: Dict[ForecastKey, Callable[[], Awaitable[Forecast]]] = {}
+    for i in range(0, len(pending), size):
+        part = pending[i : i + size]
+        chunk = asyncio.ensure_future(request([coords for _, coords in part]))
+        for index, (key, _) in enumerate(part):
+            fetches[key] = take(chunk, index, key)
+    flights = {
+        key: upstream_flights.start(
+            ("forecast", key),
+            _as_service_call(fetches.get(key) or fetch_one(key, lat, lon)),
+        )
+        for key, (lat, lon) in locations.items()
+    }
+
+    # Shielded: flights may have other waiters, so cancelling this batch
+    # must not cancel them.
+    outcomes = await asyncio.gather(
+        *(asyncio.shield(flights[key]) for key in locations), return_exceptions=True
+    )
+    results: Dict[ForecastKey, Forecast | WeatherServiceError] = {}
+    for key, outcome in zip(locations, outcomes):
+        if isinstance(outcome, BaseException) and not isinstance(
+            outcome, WeatherServiceError
+        ):
+            raise outcome
+        results[key] = outcome
+    return results
+
+
+async def _refresh_forecasts(
+    locations: Dict[ForecastKey, Tuple[float, float]],
+    client: httpx.AsyncClient | None,
+) -> None:
+    results = await _fetch_forecasts(locations, client)
+    failed = [r for r in results.values() if isinstance(r, WeatherServiceError)]
+    if failed:
+        logger.warning(
+            "Background refresh failed for %d forecasts: %s", len(failed), failed[0]
+        )
 
 
 async def fetch_weather_by_city(
@@ -90,10 +839,21 @@ async def fetch_weather_by_city(
     fetch its forecast and return both.
     :raises WeatherServiceError: if no match or underlying API errors.
     """
+    city, forecast = await load_weather_by_city(city_name, client=client)
+    return city, forecast.to_response()
+
+
+async def load_weather_by_city(
+    city_name: str, client: httpx.AsyncClient | None = None
+) -> Tuple[City, Forecast]:
+    """
+    Like ``fetch_weather_by_city``, returning the columnar ``Forecast``.
+    :raises WeatherServiceError: if no match or underlying API errors.
+    """
     cities = await search_city(city_name, max_results=1, client=client)
     if not cities:
         raise WeatherServiceError(f"No matching city for '{city_name}'")
 
     city = cities[0]
-    forecast = await get_forecast(city.latitude, city.longitude)
+    forecast = await load_forecast(city.latitude, city.longitude, client=client)
     return city, forecast
@@ -0,0 +1,142 @@
+const input = document.getElementById('city-input');
+const sugg = document.getElementById('suggestions');
+let timer = null, selected = -1, lastList = [], generation = 0;
+let currentQuery = '', socket = null, socketFailed = !('WebSocket' in window);
+
+input.addEventListener('input', () => {
+    clearTimeout(timer);
+    const q = input.value.trim();
+    if (!q) {
+        generation++;
+        currentQuery = '';
+        sugg.innerHTML = '';
+        sugg.classList.remove('show');
+        return;
+    }
+    timer = setTimeout(fetchSuggestions, 200);
+});
+
+function fetchSuggestions() {
+    generation++;
+    currentQuery = input.value.trim();
+    sugg.innerHTML = '<li class="loading p-3 text-blue-500 italic">Loading…</li>';
+    sugg.classList.add('show');
+    lastList = [];
+    selected = -1;
+    if (socketFailed) return streamSuggestions(generation, currentQuery);
+    sendQuery();
+}
+
+function showEmpty(failed) {
+    if (lastList.length) return;
+    sugg.innerHTML = failed
+        ? '<li class="error p-3 text-red-500 italic">Error</li>'
+        : '<li class="none p-3 text-blue-500 italic">No matches</li>';
+}
+
+// One long-lived /api/suggest/ws connection: each keystroke's query replaces
+// the previous one server-side, and replies for other queries are ignored.
+function sendQuery() {
+    if (socket && socket.readyState === WebSocket.OPEN) {
+        return socket.send(JSON.stringify({ query: currentQuery }));
+    }
+    if (socket && socket.readyState === WebSocket.CONNECTING) return;
+    const scheme = location.protocol === 'https:' ? 'wss' : 'ws';
+    const ws = new WebSocket(`${scheme}://${location.host}/api/suggest/ws`);
+    let opened = false;
+    ws.onopen = () => {
+        opened = true;
+        if (currentQuery) ws.send(JSON.stringify({ query: currentQuery }));
+    };
+    ws.onmessage = (e) => {
+        const msg = JSON.parse(e.data);
+        if (msg.query !== currentQuery) return;
+        if (msg.results) msg.results.forEach(appendSuggestion);
+        else if (msg.error) showEmpty(true);
+        else if (msg.done) showEmpty(false);
+    };
+    ws.onclose = () => {
+        if (socket === ws) socket = null;
+        if (!opened) {
+            // No WebSocket support on the way to the server: use HTTP streaming.
+            socketFailed = true;
+            if (currentQuery) streamSuggestions(generation, currentQuery);
+        }
+    };
+    socket = ws;
+}
+
+// Fallback: /api/suggest/stream (NDJSON), history matches first, external
+// suggestions appended as they arrive.
+async function streamSuggestions(current, query) {
+    let failed = false;
+    try {
+        const res = await fetch(`/api/suggest/stream?query=${encodeURIComponent(query)}`);
+        if (!res.ok) throw new Error(res.statusText);
+        const reader = res.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        for (;;) {
+            const { value, done } = await reader.read();
+            if (current !== generation) return reader.cancel();
+            buffer += decoder.decode(value, { stream: !done });
+            const lines = buffer.split('\n');
+            buffer = lines.pop();
+            for (const line of lines.filter(Boolean)) {
+                const item = JSON.parse(line);
+                if (item.error) failed = true;
+                else appendSuggestion(item);
+            }
+            if (done) break;
+        }
+    } catch {
+        failed = true;
+    }
+    if (current === generation) showEmpty(failed);
+}
+
+function appendSuggestion(city) {
+    if (!lastList.length) sugg.innerHTML = '';
+    const i = lastList.push(city) - 1;
+    sugg.insertAdjacentHTML(
+        'beforeend',
+        `<li data-idx="${i}" class="p-3 hover:bg-blue-100 cursor-pointer transition duration-200 text-blue-700">${highlight(city.name)}</li>`
+    );
+}
+
+function highlight(name) {
+    const q = input.value.trim().replace(/[-\/\\^$*+?.()|[\]{}]/g, '\\$&');
+    return name.replace(
+        new RegExp(`^(${q})`, 'i'),
+        '<span class="font-bold text-blue-900">$1</span>'
+    );
+}
+
+sugg.addEventListener('click', (e) => {
+    const li = e.target.closest('li[data-idx]');
+    if (!li) return;
+    input.value = lastList[+li.dataset.idx].name;
+    sugg.classList.remove('show');
+});
+
+input.addEventListener('keydown', (e) => {
+    const items = sugg.querySelectorAll('li[data-idx]');
+    if (!items.length) return;
+    if (e.key === 'ArrowDown') {
+        selected = Math.min(selected + 1, items.length - 1);
+    } else if (e.key === 'ArrowUp') {
+        selected = Math.max(selected - 1, -1);
+    } else if (e.key === 'Enter' && selected >= 0) {
+        input.value = lastList[selected].name;
+        sugg.classList.remove('show');
+    } else {
+        return;
+    }
+    items.forEach(li => li.classList.remove('bg-blue-200'));
+    if (selected >= 0) items[selected].classList.add('bg-blue-200');
+    e.preventDefault();
+});
+
+document.addEventListener('click', (e) => {
+    if (e.target !== input) sugg.classList.remove('show');
+});
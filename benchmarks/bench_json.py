@@ -0,0 +1,127 @@
+"""
+Requests/sec on /api/weather and /api/suggest with JSON handled by the stdlib
+json module versus orjson (settings.fast_json).
+
+Upstream responses are realistic in size (a 7-day hourly forecast, 15
+geocoding results) and the service caches are cleared before every request,
+so each one parses upstream JSON and renders its response body. The
+upstream rate limiter, retries and hedging are switched off so they do not
+bound the numbers. Runs
+in-process over httpx's ASGITransport against an in-memory SQLite database,
+with the Open-Meteo APIs mocked by respx::
+
+    DATABASE_URL=postgresql+asyncpg://u:p@localhost/db \\
+        python -m benchmarks.bench_json
+"""
+
+import argparse
+import asyncio
+import time
+
+import respx
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient, Response
+
+import app.services.weather as weather_mod
+from app.core.config import settings
+from app.core.fastjson import orjson
+from app.core.http import create_http_client
+from app.middleware import AuthMiddleware
+from app.services.ratelimit import AdaptiveLimiter
+from benchmarks.bench_middleware import COOKIE, build_app, setup_database
+
+HOURS = 7 * 24
+
+
+def forecast_payload() -> dict:
+    start = 1748217600
+    return {
+        "latitude": 51.5,
+        "longitude": -0.12,
+        "generationtime_ms": 0.2,
+        "utc_offset_seconds": 3600,
+        "timezone": "Europe/London",
+        "timezone_abbreviation": "BST",
+        "elevation": 23.0,
+        "hourly": {
+            "time": [start + 3600 * i for i in range(HOURS)],
+            "temperature_2m": [round(10 + (i % 24) * 0.4, 1) for i in range(HOURS)],
+            "weathercode": [i % 4 for i in range(HOURS)],
+        },
+    }
+
+
+def geocoding_payload() -> dict:
+    return {
+        "results": [
+            {
+                "name": f"London {i}",
+                "country": "United Kingdom",
+                "country_code": "GB",
+                "latitude": 51.5 + i / 100,
+                "longitude": -0.12,
+                "admin1": "England",
+                "timezone": "Europe/London",
+            }
+            for i in range(15)
+        ]
+    }
+
+
+async def measure(bench_app: FastAPI, path: str, params: dict, requests: int) -> float:
+    async with AsyncClient(
+        transport=ASGITransport(app=bench_app),
+        base_url="http://bench",
+        cookies={"anon_uuid": COOKIE},
+    ) as client:
+
+        async def call():
+            weather_mod.forecast_cache.clear()
+            weather_mod.geocoding_cache.clear()
+            resp = await client.get(path, params=params)
+            resp.raise_for_status()
+
+        for _ in range(50):
+            await call()
+        start = time.perf_counter()
+        for _ in range(requests):
+            await call()
+        return requests / (time.perf_counter() - start)
+
+
+async def main(requests: int) -> None:
+    if orjson is None:
+        raise SystemExit("orjson is not installed (poetry install -E fast-json)")
+    # Measure JSON handling, not the Open-Meteo pacing in front of it.
+    weather_mod.upstream_limiter = AdaptiveLimiter(
+        rate=1e6, burst=1_000_000, max_concurrency=1000, queue_timeout=1.0
+    )
+    settings.upstream_retries = 0
+    settings.upstream_hedge = False
+    engine = await setup_database()
+    bench_app = build_app(AuthMiddleware)
+    endpoints = [
+        ("/api/weather", {"city": "London"}),
+        ("/api/suggest", {"query": "Lon"}),
+    ]
+    with respx.mock:
+        bench_app.state.http_client = create_http_client()
+        respx.get(weather_mod.GEOCODING_API_URL).mock(
+            return_value=Response(200, json=geocoding_payload())
+        )
+        respx.get(weather_mod.FORECAST_API_URL).mock(
+            return_value=Response(200, json=forecast_payload())
+        )
+        for path, params in endpoints:
+            for name, fast in (("json", False), ("orjson", True)):
+                settings.fast_json = fast
+                rps = await measure(bench_app, path, params, requests)
+                print(f"{path:<14} {name:<8} {rps:10.0f} req/s")
+        await bench_app.state.http_client.aclose()
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-n", "--requests", type=int, default=1000)
+    asyncio.run(main(parser.parse_args().requests))
@@ -0,0 +1,113 @@
+"""
+Requests/sec on /api/health and /api/suggest with the pure ASGI AuthMiddleware
+versus the previous BaseHTTPMiddleware-based implementation.
+
+Runs in-process over httpx's ASGITransport against an in-memory SQLite
+database, with the Open-Meteo geocoding API mocked by respx::
+
+    DATABASE_URL=postgresql+asyncpg://u:p@localhost/db \
+        python -m benchmarks.bench_middleware
+"""
+
+import argparse
+import asyncio
+import time
+
+import respx
+from fastapi import FastAPI, Request
+from httpx import ASGITransport, AsyncClient, Response
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+from sqlalchemy.pool import StaticPool
+from starlette.middleware import Middleware
+from starlette.middleware.base import BaseHTTPMiddleware
+
+import app.db.session as session_mod
+import app.middleware as middleware_mod
+from app.db.base import Base
+from app.middleware import AuthMiddleware, _load_user_id
+from app.models.user import User
+from app.routers import api
+from app.services.users import CurrentUser
+from app.services.weather import GEOCODING_API_URL
+
+COOKIE = "bench-cookie"
+
+
+class BaseHTTPAuthMiddleware(BaseHTTPMiddleware):
+    """The same user resolution, done the way AuthMiddleware used to."""
+
+    async def dispatch(self, request: Request, call_next):
+        cookie = request.cookies["anon_uuid"]
+        request.state.user = CurrentUser(cookie, await _load_user_id(cookie))
+        return await call_next(request)
+
+
+def build_app(middleware_class) -> FastAPI:
+    bench_app = FastAPI(middleware=[Middleware(middleware_class)])
+    bench_app.include_router(api.router, prefix="/api")
+    return bench_app
+
+
+async def setup_database() -> AsyncEngine:
+    engine = create_async_engine(
+        "sqlite+aiosqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    SessionLocal = async_sessionmaker(
+        bind=engine, class_=AsyncSession, expire_on_commit=False
+    )
+    session_mod.AsyncSessionLocal = SessionLocal
+    middleware_mod.AsyncSessionLocal = SessionLocal
+    async with SessionLocal() as session:
+        session.add(User(cookie_id=COOKIE))
+        await session.commit()
+    return engine
+
+
+async def measure(bench_app: FastAPI, path: str, params: dict, requests: int) -> float:
+    async with AsyncClient(
+        transport=ASGITransport(app=bench_app),
+        base_url="http://bench",
+        cookies={"anon_uuid": COOKIE},
+    ) as client:
+        for _ in range(50):
+            await client.get(path, params=params)
+        start = time.perf_counter()
+        for _ in range(requests):
+            await client.get(path, params=params)
+        return requests / (time.perf_counter() - start)
+
+
+async def main(requests: int) -> None:
+    engine = await setup_database()
+    apps = {
+        "BaseHTTPMiddleware": build_app(BaseHTTPAuthMiddleware),
+        "pure ASGI": build_app(AuthMiddleware),
+    }
+    endpoints = [
+        ("/api/health", {}),
+        ("/api/suggest", {"query": "Lon"}),
+    ]
+    with respx.mock:
+        respx.get(GEOCODING_API_URL).mock(
+            return_value=Response(200, json={"results": [{"name": "London"}]})
+        )
+        for path, params in endpoints:
+            for name, bench_app in apps.items():
+                rps = await measure(bench_app, path, params, requests)
+                print(f"{path:<14} {name:<20} {rps:10.0f} req/s")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-n", "--requests", type=int, default=1000)
+    asyncio.run(main(parser.parse_args().requests))
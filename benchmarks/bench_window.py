@@ -0,0 +1,82 @@
+"""
+Microbenchmark: selecting the upcoming hours of a forecast.
+
+Compares the per-element loop post_weather used to run (localize every
+timestamp, compare it to now, slice the result) against Forecast.window,
+which binary-searches the epoch column and slices it without copying.
+Runs on multi-week hourly arrays::
+
+    DATABASE_URL=postgresql+asyncpg://u:p@localhost/db \\
+        python -m benchmarks.bench_window
+"""
+
+import argparse
+import time
+import timeit
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from app.services.forecast import Forecast
+
+TZ = ZoneInfo("Europe/Berlin")
+
+
+def make_forecast(hours: int, now: float) -> Forecast:
+    # Half of the range lies in the past, like a forecast with past_days
+    start = int(now) - (hours // 2) * 3600
+    return Forecast.from_payload(
+        {
+            "latitude": 52.52,
+            "longitude": 13.41,
+            "generationtime_ms": 0.1,
+            "utc_offset_seconds": 7200,
+            "timezone": "Europe/Berlin",
+            "timezone_abbreviation": "CEST",
+            "hourly": {
+                "time": [start + 3600 * i for i in range(hours)],
+                "temperature_2m": [float(i % 30) for i in range(hours)],
+                "weathercode": [i % 4 for i in range(hours)],
+            },
+        }
+    )
+
+
+def loop_filter(forecast: Forecast, now: float):
+    now_local = datetime.fromtimestamp(now, TZ)
+    entries = list(zip(forecast.datetimes(), forecast.temperatures))
+    future_entries = []
+    for t, temp in entries:
+        t_local = t.astimezone(TZ) if t.tzinfo else t.replace(tzinfo=TZ)
+        if t_local >= now_local:
+            future_entries.append((t_local, temp))
+    return future_entries[:6], future_entries
+
+
+def window_select(forecast: Forecast, now: float):
+    upcoming = forecast.window(start=now)
+    return upcoming.head(6), upcoming
+
+
+def window_render(forecast: Forecast, now: float):
+    full = forecast.window(start=now).local_entries(TZ)
+    return full[:6], full
+
+
+def main(number: int) -> None:
+    now = time.time()
+    for weeks in (1, 2, 4, 8):
+        forecast = make_forecast(weeks * 7 * 24, now)
+        for name, fn in (
+            ("loop", loop_filter),
+            ("window", window_select),
+            ("window+localize", window_render),
+        ):
+            seconds = timeit.timeit(lambda: fn(forecast, now), number=number)
+            usec = seconds / number * 1e6
+            print(f"{weeks:>2} weeks  {len(forecast):>5} h  {name:<16} {usec:10.1f} us")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-n", "--number", type=int, default=200)
+    main(parser.parse_args().number)
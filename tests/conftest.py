@@ -10,7 +10,13 @@ from sqlalchemy.pool import StaticPool
 
 import app.db.session as session_mod
 import app.middleware as middleware_mod
+import app.routers.api as api_mod
+import app.services.history as history_mod
+import app.services.users as users_mod
+import app.services.weather as weather_mod
 from app.db.base import Base
+from app.services.cache import CacheStats
+from app.services.ratelimit import AdaptiveLimiter
 
 TEST_DATABASE_URL = "sqlite+aiosqlite:///:memory:"
 
@@ -60,10 +66,13 @@ def SessionLocal(engine):
 @pytest.fixture(autouse=True)
 def override_sessionmaker(monkeypatch, SessionLocal):
     """
-    Override the sessionmaker in app.db.session and app.middleware
+    Override the sessionmaker in app.db.session, app.middleware, the
+    history writer and the suggestions WebSocket
     """
     monkeypatch.setattr(session_mod, "AsyncSessionLocal", SessionLocal)
+    monkeypatch.setattr(api_mod, "AsyncSessionLocal", SessionLocal)
     monkeypatch.setattr(middleware_mod, "AsyncSessionLocal", SessionLocal)
+    monkeypatch.setattr(history_mod, "AsyncSessionLocal", SessionLocal)
 
     async def _get_test_session():
         async with SessionLocal() as s:
@@ -72,6 +81,48 @@ def override_sessionmaker(monkeypatch, SessionLocal):
     monkeypatch.setattr(session_mod, "get_async_session", _get_test_session)
 
 
+@pytest.fixture(autouse=True)
+def reset_service_caches():
+    """
+    Start every test with empty in-process caches in the services
+    """
+    weather_mod.forecast_cache.clear()
+    weather_mod.forecast_cache.stats = CacheStats()
+    weather_mod.geocoding_cache.clear()
+    users_mod.user_cache.clear()
+    users_mod.unknown_cookies.clear()
+    yield
+    weather_mod.forecast_cache.clear()
+    weather_mod.geocoding_cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def upstream_limiter(monkeypatch):
+    """
+    A fresh, generous Open-Meteo limiter per test, so throttling in one test
+    does not slow down the next
+    """
+    limiter = AdaptiveLimiter(
+        rate=1000, burst=1000, max_concurrency=100, queue_timeout=1.0
+    )
+    monkeypatch.setattr(weather_mod, "upstream_limiter", limiter)
+    return limiter
+
+
+@pytest.fixture(autouse=True)
+def upstream_resilience(monkeypatch):
+    """
+    Closed circuits, no latency history and near-instant retries per test
+    """
+    monkeypatch.setattr(weather_mod.settings, "upstream_retry_base_delay", 0.001)
+    monkeypatch.setattr(weather_mod.settings, "upstream_retry_max_delay", 0.005)
+    monkeypatch.setattr(weather_mod, "upstream_stats", weather_mod.UpstreamStats())
+    for breaker in weather_mod.upstream_breakers.values():
+        breaker.reset()
+    for latency in weather_mod.upstream_latency.values():
+        latency.clear()
+
+
 @pytest.fixture
 def db_session(event_loop, SessionLocal):
 
@@ -1,8 +1,23 @@
+import asyncio
+import json
+import threading
+import time
+
 import pytest
 import respx
+from fastapi import WebSocketDisconnect
+from fastapi.testclient import TestClient
 from httpx import ASGITransport, AsyncClient, Response
+from sqlalchemy import select
 
+import app.core.http as http_mod
+import app.routers.api as api_mod
+import app.services.weather as weather_mod
+from app.core.config import settings
 from app.main import app
+from app.models.search_history import SearchHistory
+from app.models.user import User
+from app.services.suggest import streamed_suggestions
 from app.services.weather import FORECAST_API_URL, GEOCODING_API_URL
 
 
@@ -107,3 +122,409 @@ async def test_api_weather_not_found():
         resp = await ac.get("/api/weather", params={"city": "Nowhere"})
     assert resp.status_code == 404
     assert "No matching city for 'Nowhere'" in resp.json()["detail"]
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_api_weather_window():
+    respx.get(GEOCODING_API_URL).mock(
+        return_value=Response(
+            200,
+            json={"results": [{"name": "TestCity", "latitude": 1, "longitude": 2}]},
+        )
+    )
+    respx.get(FORECAST_API_URL).mock(
+        return_value=Response(
+            200,
+            json={
+                "latitude": 1.0,
+                "longitude": 2.0,
+                "generationtime_ms": 0.5,
+                "utc_offset_seconds": 0,
+                "timezone": "GMT",
+                "timezone_abbreviation": "GMT",
+                "hourly": {
+                    "time": [1748217600 + 3600 * i for i in range(6)],
+                    "temperature_2m": [10.0, 11.0, 12.0, 13.0, 14.0, 15.0],
+                    "weathercode": [0, 0, 1, 1, 2, 2],
+                },
+            },
+        )
+    )
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        resp = await ac.get(
+            "/api/weather",
+            params={"city": "TestCity", "from": "2025-05-26T01:30:00Z", "hours": 3},
+        )
+        assert resp.status_code == 200
+        hourly = resp.json()["hourly"]
+        assert hourly["time"] == [
+            "2025-05-26T02:00:00",
+            "2025-05-26T03:00:00",
+            "2025-05-26T04:00:00",
+        ]
+        assert hourly["temperature_2m"] == [12.0, 13.0, 14.0]
+
+        resp = await ac.get("/api/weather", params={"city": "TestCity", "from": "now"})
+        assert resp.status_code == 200
+        assert resp.json()["hourly"]["time"] == []
+
+        resp = await ac.get("/api/weather", params={"city": "TestCity", "from": "soon"})
+        assert resp.status_code == 400
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_api_weather_rate_limited_upstream_is_503():
+    respx.get(GEOCODING_API_URL).mock(
+        return_value=Response(429, headers={"Retry-After": "2.5"}, json={})
+    )
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        resp = await ac.get("/api/weather", params={"city": "Busyville"})
+    assert resp.status_code == 503
+    assert resp.headers["Retry-After"] == "3"
+    assert "rate limit" in resp.json()["detail"]
+
+
+@pytest.mark.asyncio
+async def test_api_weather_open_circuit_is_503():
+    breaker = weather_mod.upstream_breakers["Geocoding"]
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        resp = await ac.get("/api/weather", params={"city": "Downville"})
+    assert resp.status_code == 503
+    assert int(resp.headers["Retry-After"]) > 0
+
+
+@pytest.mark.asyncio
+async def test_lifespan_manages_shared_http_client():
+    async with app.router.lifespan_context(app):
+        client = app.state.http_client
+        assert client is not None
+        assert not client.is_closed
+    assert client.is_closed
+    assert app.state.http_client is None
+
+
+@pytest.mark.asyncio
+async def test_http_client_falls_back_to_http1_without_h2(monkeypatch):
+    monkeypatch.setattr(settings, "http2", True)
+    monkeypatch.setattr(http_mod, "find_spec", lambda name: None)
+    client = http_mod.create_http_client()
+    assert not client._transport._pool._http2
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_api_suggest_ranks_history_prefix_matches_first(db_session):
+    user = User(cookie_id="suggest-rank-uuid")
+    db_session.add(user)
+    await db_session.commit()
+    db_session.add_all(
+        [
+            SearchHistory(user_id=user.id, city_name=name)
+            for name in ["Alberta"] * 5 + ["Berlin"] * 3 + ["Bern"] + ["100%ber"]
+        ]
+    )
+    await db_session.commit()
+    respx.get(GEOCODING_API_URL).mock(return_value=Response(200, json={"results": []}))
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app),
+        base_url="http://test",
+        cookies={"anon_uuid": user.cookie_id},
+    ) as ac:
+        resp = await ac.get("/api/suggest", params={"query": "BER"})
+        assert [c["name"] for c in resp.json()] == [
+            "Berlin",
+            "Bern",
+            "Alberta",
+            "100%ber",
+        ]
+
+        resp = await ac.get("/api/suggest", params={"query": "0%b"})
+        assert [c["name"] for c in resp.json()] == ["100%ber"]
+
+
+async def _user_with_history(db_session, cookie_id, *cities):
+    user = User(cookie_id=cookie_id)
+    db_session.add(user)
+    await db_session.commit()
+    db_session.add_all(
+        [SearchHistory(user_id=user.id, city_name=name) for name in cities]
+    )
+    await db_session.commit()
+    return user
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_api_suggest_answers_from_history_after_upstream_deadline(
+    db_session, monkeypatch
+):
+    monkeypatch.setattr(settings, "suggest_upstream_deadline", 0.05)
+    user = await _user_with_history(db_session, "deadline-uuid", "Rostock")
+
+    release = asyncio.Event()
+
+    async def slow_geocoding(request):
+        await release.wait()
+        return Response(200, json={"results": [{"name": "Rome"}]})
+
+    respx.get(GEOCODING_API_URL).mock(side_effect=slow_geocoding)
+    async with AsyncClient(
+        transport=ASGITransport(app=app),
+        base_url="http://test",
+        cookies={"anon_uuid": user.cookie_id},
+    ) as ac:
+        resp = await ac.get("/api/suggest", params={"query": "Ro"})
+    assert resp.status_code == 200
+    assert [c["name"] for c in resp.json()] == ["Rostock"]
+
+    # The upstream call was left running and still fills the geocoding cache.
+    release.set()
+    while len(weather_mod.upstream_flights):
+        await asyncio.sleep(0.01)
+    assert weather_mod.geocoding_cache.get("Ro", 15)[0].name == "Rome"
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_api_suggest_upstream_error_falls_back_to_history(db_session):
+    user = await _user_with_history(db_session, "fallback-uuid", "Errfurt")
+    respx.get(GEOCODING_API_URL).mock(return_value=Response(500, text="Oops"))
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app),
+        base_url="http://test",
+        cookies={"anon_uuid": user.cookie_id},
+    ) as ac:
+        resp = await ac.get("/api/suggest", params={"query": "Err"})
+    assert resp.status_code == 200
+    assert [c["name"] for c in resp.json()] == ["Errfurt"]
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_api_suggest_stream_sends_history_then_new_upstream(db_session):
+    user = await _user_with_history(db_session, "stream-uuid", "Dresden", "Dresden")
+    respx.get(GEOCODING_API_URL).mock(
+        return_value=Response(
+            200, json={"results": [{"name": "Dresden"}, {"name": "Dreux"}]}
+        )
+    )
+    async with AsyncClient(
+        transport=ASGITransport(app=app),
+        base_url="http://test",
+        cookies={"anon_uuid": user.cookie_id},
+    ) as ac:
+        resp = await ac.get("/api/suggest/stream", params={"query": "Dre"})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in resp.text.splitlines()]
+    assert [c["name"] for c in lines] == ["Dresden", "Dreux"]
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_api_suggest_stream_reports_upstream_errors(db_session):
+    user = await _user_with_history(db_session, "stream-err-uuid", "Essen")
+    respx.get(GEOCODING_API_URL).mock(return_value=Response(500, text="Oops"))
+    async with AsyncClient(
+        transport=ASGITransport(app=app),
+        base_url="http://test",
+        cookies={"anon_uuid": user.cookie_id},
+    ) as ac:
+        resp = await ac.get("/api/suggest/stream", params={"query": "Ess"})
+    assert resp.status_code == 200
+    lines = [json.loads(line) for line in resp.text.splitlines()]
+    assert lines[0]["name"] == "Essen"
+    assert lines[1] == {"error": "Oops"}
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_streamed_suggestions_yield_history_before_upstream(db_session):
+    user = await _user_with_history(db_session, "stream-fast-uuid", "Bremen")
+    release = asyncio.Event()
+
+    async def slow_geocoding(request):
+        await release.wait()
+        return Response(200, json={"results": [{"name": "Brest"}]})
+
+    respx.get(GEOCODING_API_URL).mock(side_effect=slow_geocoding)
+    batches = streamed_suggestions(db_session, user.id, "Bre", 15)
+
+    first = await asyncio.wait_for(anext(batches), timeout=1)
+    assert [c.name for c in first] == ["Bremen"]
+    release.set()
+    second = await anext(batches)
+    assert [c.name for c in second] == ["Brest"]
+    with pytest.raises(StopAsyncIteration):
+        await anext(batches)
+
+
+def test_suggest_ws_cancels_superseded_queries(monkeypatch):
+    monkeypatch.setattr(settings, "suggest_ws_debounce", 0)
+    release = threading.Event()
+    requested = []
+    aborted = []
+
+    async def geocoding(request):
+        name = request.url.params["name"]
+        requested.append(name)
+        try:
+            while name == "Ro" and not release.is_set():
+                await asyncio.sleep(0.01)
+        except asyncio.CancelledError:
+            aborted.append(name)
+            raise
+        return Response(200, json={"results": [{"name": name + "me"}]})
+
+    with respx.mock:
+        respx.get(GEOCODING_API_URL).mock(side_effect=geocoding)
+        with TestClient(app).websocket_connect("/api/suggest/ws") as ws:
+            ws.send_json({"query": "Ro"})
+            while "Ro" not in requested:
+                time.sleep(0.01)
+            ws.send_json({"query": "Rom", "limit": 5})
+            results = ws.receive_json()
+            assert results["query"] == "Rom"
+            assert [c["name"] for c in results["results"]] == ["Romme"]
+            assert ws.receive_json() == {"query": "Rom", "done": True}
+
+            release.set()
+            ws.send_text("not json")
+            assert ws.receive_json() == {"error": "Invalid message"}
+            ws.send_json({"query": "Pa"})
+            # Nothing for the cancelled "Ro" query arrives in between.
+            assert ws.receive_json()["query"] == "Pa"
+            assert ws.receive_json() == {"query": "Pa", "done": True}
+            # The upstream call for "Ro" had no other waiter, so it was aborted.
+            while len(weather_mod.upstream_flights):
+                time.sleep(0.01)
+        assert aborted == ["Ro"]
+        assert weather_mod.geocoding_cache.get("Ro", 15) is None
+
+
+def test_suggest_ws_reports_unexpected_errors(monkeypatch, caplog):
+    async def broken_suggestions(*args, **kwargs):
+        raise RuntimeError("database is down")
+        yield []
+
+    monkeypatch.setattr(api_mod, "streamed_suggestions", broken_suggestions)
+    with TestClient(app).websocket_connect("/api/suggest/ws") as ws:
+        ws.send_json({"query": "Os"})
+        assert ws.receive_json() == {"query": "Os", "error": "Suggestions failed"}
+        assert ws.receive_json() == {"query": "Os", "done": True}
+    assert "database is down" in caplog.text
+
+
+def test_suggest_ws_closes_on_binary_frames():
+    with TestClient(app).websocket_connect("/api/suggest/ws") as ws:
+        ws.send_bytes(b'{"query": "Os"}')
+        with pytest.raises(WebSocketDisconnect) as closed:
+            ws.receive_json()
+    assert closed.value.code == 1003
+
+
+def test_suggest_ws_debounces_upstream_calls(monkeypatch):
+    monkeypatch.setattr(settings, "suggest_ws_debounce", 0.3)
+    with respx.mock:
+        route = respx.get(GEOCODING_API_URL).mock(
+            return_value=Response(200, json={"results": [{"name": "Berlin"}]})
+        )
+        with TestClient(app).websocket_connect("/api/suggest/ws") as ws:
+            for query in ("B", "Be", "Ber"):
+                ws.send_json({"query": query})
+            results = ws.receive_json()
+            assert results["query"] == "Ber"
+            assert ws.receive_json() == {"query": "Ber", "done": True}
+        assert [c.request.url.params["name"] for c in route.calls] == ["Ber"]
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_api_weather_batch(db_session):
+    def geocoding(request):
+        name = request.url.params["name"]
+        if name == "Nowhere":
+            return Response(200, json={"results": []})
+        city = {"name": name, "latitude": 1.0, "longitude": 2.0}
+        return Response(200, json={"results": [city]})
+
+    def forecasts(request):
+        lats = request.url.params["latitude"].split(",")
+        payloads = [
+            {
+                "latitude": float(lat),
+                "longitude": 2.0,
+                "generationtime_ms": 0.5,
+                "utc_offset_seconds": 0,
+                "timezone": "GMT",
+                "timezone_abbreviation": "GMT",
+                "hourly": {
+                    "time": [1748217600],
+                    "temperature_2m": [float(lat)],
+                    "weathercode": [0],
+                },
+            }
+            for lat in lats
+        ]
+        return Response(200, json=payloads)
+
+    respx.get(GEOCODING_API_URL).mock(side_effect=geocoding)
+    forecast_route = respx.get(FORECAST_API_URL).mock(side_effect=forecasts)
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app),
+        base_url="http://test",
+        cookies={"anon_uuid": "batch-uuid"},
+    ) as ac:
+        resp = await ac.post(
+            "/api/weather/batch",
+            json={
+                "locations": [
+                    {"city": "Batchville"},
+                    {"latitude": 3.0, "longitude": 4.0},
+                    {"city": "Nowhere"},
+                    {"city": "Batchburg"},
+                ]
+            },
+        )
+        assert resp.status_code == 200
+        items = resp.json()
+        assert [i["city"] and i["city"]["name"] for i in items] == [
+            "Batchville",
+            None,
+            None,
+            "Batchburg",
+        ]
+        assert items[1]["forecast"]["hourly"]["temperature_2m"] == [3.0]
+        assert items[2] == {
+            "city": None,
+            "forecast": None,
+            "error": "No matching city for 'Nowhere'",
+        }
+        assert forecast_route.call_count == 1
+
+        resp = await ac.post("/api/weather/batch", json={"locations": [{}]})
+        assert resp.status_code == 422
+
+    user = (
+        await db_session.execute(select(User).filter_by(cookie_id="batch-uuid"))
+    ).scalar_one()
+    names = (
+        await db_session.execute(
+            select(SearchHistory.city_name).filter_by(user_id=user.id)
+        )
+    ).scalars()
+    assert sorted(names) == ["Batchburg", "Batchville"]
@@ -0,0 +1,63 @@
+from app.services.cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_ttl_cache_expires_entries():
+    clock = FakeClock()
+    cache = TTLCache(maxsize=10, ttl=60, clock=clock)
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+
+    clock.now = 61
+    assert cache.get("a") is None
+    assert len(cache) == 0
+    assert cache.stats.hits == 1
+    assert cache.stats.misses == 1
+    assert cache.stats.expirations == 1
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert "a" in cache
+    assert "b" not in cache
+    assert "c" in cache
+    assert cache.stats.evictions == 1
+
+
+def test_ttl_cache_respects_memory_budget():
+    cache = TTLCache(maxsize=100, ttl=60, max_bytes=250, sizeof=lambda v: 100)
+    for key in "abc":
+        cache.set(key, key)
+
+    assert len(cache) == 2
+    assert cache.nbytes == 200
+    assert "a" not in cache
+
+
+def test_ttl_cache_keeps_stale_entries_for_lookup():
+    clock = FakeClock()
+    cache = TTLCache(maxsize=10, ttl=60, stale_ttl=30, clock=clock)
+    cache.set("a", 1)
+
+    clock.now = 75
+    assert cache.get("a") is None
+    found = cache.lookup("a")
+    assert found.value == 1
+    assert not found.fresh
+    assert cache.stats.stale_hits == 1
+
+    clock.now = 91
+    assert cache.lookup("a") is None
+    assert len(cache) == 0
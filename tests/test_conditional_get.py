@@ -0,0 +1,165 @@
+from unittest.mock import patch
+
+import pytest
+import respx
+from httpx import ASGITransport, AsyncClient, Response
+
+import app.services.weather as weather_mod
+from app.main import app
+from app.models.search_history import SearchHistory
+from app.models.user import User
+from app.services.forecast import Forecast
+from app.services.weather import FORECAST_API_URL, GEOCODING_API_URL
+
+
+def _client(**kwargs) -> AsyncClient:
+    return AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test", **kwargs
+    )
+
+
+def _mock_weather(temperatures=(18.0, 19.0)):
+    respx.get(GEOCODING_API_URL).mock(
+        return_value=Response(
+            200,
+            json={"results": [{"name": "Etagville", "latitude": 5, "longitude": 6}]},
+        )
+    )
+    respx.get(FORECAST_API_URL).mock(
+        return_value=Response(
+            200,
+            json={
+                "latitude": 5.0,
+                "longitude": 6.0,
+                "generationtime_ms": 0.2,
+                "utc_offset_seconds": 0,
+                "timezone": "GMT",
+                "timezone_abbreviation": "GMT",
+                "hourly": {
+                    "time": [1748217600, 1748221200],
+                    "temperature_2m": list(temperatures),
+                    "weathercode": [1, 2],
+                },
+            },
+        )
+    )
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_weather_etag_and_not_modified():
+    _mock_weather()
+    async with _client() as client:
+        resp = await client.get("/api/weather", params={"city": "Etagville"})
+        assert resp.status_code == 200
+        etag = resp.headers["etag"]
+        assert resp.headers["cache-control"] == "private, no-cache"
+
+        for header in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+            resp = await client.get(
+                "/api/weather",
+                params={"city": "Etagville"},
+                headers={"If-None-Match": header},
+            )
+            assert resp.status_code == 304
+            assert resp.content == b""
+            assert resp.headers["etag"] == etag
+
+        # The tag is known before the body: a 304 never renders the forecast.
+        with patch.object(Forecast, "to_json", side_effect=AssertionError):
+            resp = await client.get(
+                "/api/weather",
+                params={"city": "Etagville"},
+                headers={"If-None-Match": etag},
+            )
+            assert resp.status_code == 304
+
+        resp = await client.get(
+            "/api/weather",
+            params={"city": "Etagville", "hours": 1},
+            headers={"If-None-Match": etag},
+        )
+        assert resp.status_code == 200
+        assert resp.headers["etag"] != etag
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_weather_etag_changes_when_the_forecast_data_changes():
+    _mock_weather(temperatures=(18.0, 19.0))
+    async with _client() as client:
+        resp = await client.get("/api/weather", params={"city": "Etagville"})
+        etag = resp.headers["etag"]
+
+        # Same hours and generationtime_ms, new temperatures
+        weather_mod.forecast_cache.clear()
+        _mock_weather(temperatures=(21.0, 19.0))
+        resp = await client.get(
+            "/api/weather",
+            params={"city": "Etagville"},
+            headers={"If-None-Match": etag},
+        )
+        assert resp.status_code == 200
+        assert resp.headers["etag"] != etag
+        assert resp.json()["hourly"]["temperature_2m"] == [21.0, 19.0]
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_cookieless_responses_are_not_publicly_cacheable():
+    _mock_weather()
+    async with _client() as client:
+        for path, params in (
+            ("/api/weather", {"city": "Etagville"}),
+            ("/api/stats", {}),
+        ):
+            client.cookies.clear()
+            resp = await client.get(path, params=params)
+            assert resp.status_code == 200
+            assert "anon_uuid=" in resp.headers["set-cookie"]
+            assert "public" not in resp.headers["cache-control"]
+            assert resp.headers["cache-control"].startswith("private")
+
+
+@pytest.mark.asyncio
+async def test_stats_etag_changes_with_new_searches(db_session):
+    user = User(cookie_id="etag-user")
+    db_session.add(user)
+    await db_session.commit()
+    db_session.add(SearchHistory(user_id=user.id, city_name="Oslo"))
+    await db_session.commit()
+
+    async with _client(cookies={"anon_uuid": user.cookie_id}) as client:
+        first = await client.get("/api/stats")
+        assert first.status_code == 200
+        assert {"city_name": "Oslo", "count": 1} in first.json()
+        assert first.headers["cache-control"].startswith("public, max-age=60")
+        etag = first.headers["etag"]
+
+        resp = await client.get("/api/stats", headers={"If-None-Match": etag})
+        assert resp.status_code == 304
+
+        db_session.add(SearchHistory(user_id=user.id, city_name="Oslo"))
+        await db_session.commit()
+        resp = await client.get("/api/stats", headers={"If-None-Match": etag})
+        assert resp.status_code == 200
+        assert {"city_name": "Oslo", "count": 2} in resp.json()
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_per_user_endpoints_are_private(db_session):
+    respx.get(GEOCODING_API_URL).mock(
+        return_value=Response(200, json={"results": [{"name": "Riga"}]})
+    )
+    async with _client(cookies={"anon_uuid": "private-user"}) as client:
+        resp = await client.get("/api/suggest", params={"query": "Ri"})
+        assert resp.status_code == 200
+        assert resp.json()[0]["name"] == "Riga"
+        assert resp.headers["cache-control"].startswith("private, max-age=60")
+        assert "etag" in resp.headers
+
+        for path in ("/api/history", "/api/user/stats"):
+            resp = await client.get(path)
+            assert resp.status_code == 200
+            assert resp.headers["cache-control"] == "private, no-cache"
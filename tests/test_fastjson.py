@@ -0,0 +1,45 @@
+import pytest
+from fastapi.responses import JSONResponse
+from httpx import ASGITransport, AsyncClient
+
+from app.core import fastjson
+from app.core.config import settings
+from app.main import app
+
+CONTENT = {
+    "name": "Zürich",
+    "values": [1, 2.5, None, True],
+    "nested": {"empty": [], "text": 'quote " and \\ backslash'},
+}
+
+
+@pytest.fixture(params=[True, False], ids=["orjson", "stdlib"])
+def fast_json(request, monkeypatch):
+    if request.param and fastjson.orjson is None:
+        pytest.skip("orjson not installed")
+    monkeypatch.setattr(settings, "fast_json", request.param)
+    return request.param
+
+
+def test_dumps_matches_starlette_rendering(fast_json):
+    assert fastjson.using_orjson() is fast_json
+    expected = JSONResponse(CONTENT).body
+    assert fastjson.dumps(CONTENT) == expected
+    assert fastjson.FastJSONResponse(CONTENT).body == expected
+
+
+def test_loads_round_trips_and_rejects_invalid(fast_json):
+    assert fastjson.loads(fastjson.dumps(CONTENT)) == CONTENT
+    with pytest.raises(ValueError):
+        fastjson.loads(b"<html>busy</html>")
+
+
+@pytest.mark.asyncio
+async def test_api_router_uses_fast_response_class(fast_json):
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        resp = await ac.get("/api/health")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "application/json"
+    assert resp.content == b'{"status":"ok"}'
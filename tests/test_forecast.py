@@ -0,0 +1,106 @@
+import json
+from datetime import timedelta, timezone
+
+import pytest
+
+from app.schemas.weather import ForecastResponse
+from app.services.forecast import Forecast
+
+
+def _payload(times, offset=0) -> dict:
+    return {
+        "latitude": 55.75,
+        "longitude": 37.62,
+        "generationtime_ms": 0.5,
+        "utc_offset_seconds": offset,
+        "timezone": "Europe/Moscow",
+        "timezone_abbreviation": "MSK",
+        "elevation": 144.0,
+        "hourly": {
+            "time": times,
+            "temperature_2m": [15.0, 14.5],
+            "weathercode": [0, 3],
+        },
+    }
+
+
+@pytest.mark.parametrize(
+    "times",
+    [
+        ["2023-10-01T00:00", "2023-10-01T01:00"],
+        ["2023-10-01T00:00:00Z", "2023-10-01T01:00:00Z"],
+    ],
+)
+def test_serialization_matches_pydantic_model(times):
+    payload = _payload(times, offset=10800)
+    forecast = Forecast.from_payload(payload)
+    expected = ForecastResponse.model_validate(payload)
+
+    assert json.loads(forecast.to_json()) == expected.model_dump(mode="json")
+    assert forecast.to_response().model_dump() == expected.model_dump()
+
+
+def test_unix_and_local_iso_times_agree():
+    iso = Forecast.from_payload(
+        _payload(["2023-10-01T03:00", "2023-10-01T04:00"], offset=10800)
+    )
+    unix = Forecast.from_payload(_payload([1696118400, 1696122000], offset=10800))
+
+    assert list(iso.times) == list(unix.times) == [1696118400, 1696122000]
+    assert unix.datetimes() == iso.datetimes()
+    assert unix.to_json() == iso.to_json()
+
+
+def test_serialized_forms_are_memoized():
+    forecast = Forecast.from_payload(_payload([1696118400, 1696122000]))
+    assert forecast.to_json() is forecast.to_json()
+    assert forecast.to_response() is forecast.to_response()
+
+
+def test_rejects_misaligned_columns():
+    payload = _payload([1696118400])
+    with pytest.raises(ValueError):
+        Forecast.from_payload(payload)
+
+
+def _hourly(start: int, hours: int) -> Forecast:
+    payload = _payload([start + 3600 * i for i in range(hours)])
+    payload["hourly"]["temperature_2m"] = [float(i) for i in range(hours)]
+    payload["hourly"]["weathercode"] = [i % 4 for i in range(hours)]
+    return Forecast.from_payload(payload)
+
+
+def test_window_starts_at_first_hour_not_before_start():
+    forecast = _hourly(1_000_000, 48)
+
+    assert forecast.window(start=1_000_000 + 3600 * 5).start == 5
+    assert forecast.window(start=1_000_000 + 3600 * 5 - 1).start == 5
+    assert forecast.window(start=1_000_000 + 3600 * 5 + 1).start == 6
+    assert len(forecast.window()) == 48
+    assert len(forecast.window(start=2_000_000)) == 0
+    assert len(forecast.window(start=2_000_000, hours=6)) == 0
+
+
+def test_window_slices_share_the_forecast_buffers():
+    forecast = _hourly(1_000_000, 48)
+    window = forecast.window(start=1_000_000 + 3600 * 10, hours=12)
+
+    assert len(window) == 12
+    assert window.times.obj is forecast.times
+    assert window.temperatures.tolist() == [float(i) for i in range(10, 22)]
+    preview = window.head(6)
+    assert preview.weathercodes.tolist() == [i % 4 for i in range(10, 16)]
+    assert len(window.head(100)) == 12
+
+
+def test_window_json_and_local_entries():
+    forecast = _hourly(1696118400, 24)
+    window = forecast.window(start=1696118400 + 3600 * 22)
+
+    body = json.loads(window.to_json())
+    assert body["hourly"]["time"] == ["2023-10-01T22:00:00", "2023-10-01T23:00:00"]
+    assert body["hourly"]["temperature_2m"] == [22.0, 23.0]
+    assert forecast.window().to_json() is forecast.to_json()
+
+    entries = window.local_entries(timezone(timedelta(hours=3)))
+    assert [(t.hour, temp) for t, temp in entries] == [(1, 22.0), (2, 23.0)]
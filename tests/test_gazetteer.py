@@ -0,0 +1,122 @@
+from pathlib import Path
+
+import pytest
+import respx
+from httpx import Response
+
+import app.geo.__main__ as geo_cli
+import app.services.weather as weather_mod
+from app.geo import (
+    CityIndex,
+    Gazetteer,
+    MappedGazetteer,
+    build_index,
+    load_gazetteer,
+    normalize_name,
+    read_geonames,
+)
+from app.services.weather import GEOCODING_API_URL, search_city
+
+CITIES_FILE = Path(__file__).parent / "fixtures" / "geonames" / "cities15000.txt"
+
+
+@pytest.fixture
+def gazetteer(monkeypatch):
+    gaz = Gazetteer.from_file(CITIES_FILE)
+    monkeypatch.setattr(weather_mod, "gazetteer", gaz)
+    return gaz
+
+
+def test_normalize_name_strips_accents_and_case():
+    assert normalize_name("  MÜNCHEN  ") == "munchen"
+    assert normalize_name("São   Paulo") == "sao paulo"
+
+
+def test_prefix_search_ranks_by_population(gazetteer):
+    assert len(gazetteer) == 10
+    cities = gazetteer.search("Lon", 5)
+    assert [(c.name, c.country_code) for c in cities] == [
+        ("London", "GB"),
+        ("London", "CA"),
+    ]
+    london = cities[0]
+    assert london.country == "United Kingdom"
+    assert london.admin1 == "England"
+    assert london.timezone == "Europe/London"
+    assert london.latitude == pytest.approx(51.50853)
+
+
+def test_exact_match_ranks_before_longer_names(gazetteer):
+    names = [c.name for c in gazetteer.search("paris", 1)]
+    assert names == ["Paris"]
+    assert gazetteer.search("paris", 1)[0].country_code == "FR"
+
+
+def test_matches_ascii_and_accented_names(gazetteer):
+    assert [c.name for c in gazetteer.search("munc", 5)] == ["München"]
+    assert [c.name for c in gazetteer.search("Muen", 5)] == ["München"]
+    assert gazetteer.search("Atlantis", 5) == []
+    assert gazetteer.search("   ", 5) == []
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_search_city_answers_locally(gazetteer):
+    route = respx.get(GEOCODING_API_URL).mock(return_value=Response(200, json={}))
+
+    cities = await search_city("Berl")
+
+    assert [c.name for c in cities] == ["Berlin"]
+    assert not route.called
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_search_city_falls_back_upstream_on_miss(gazetteer):
+    payload = {"results": [{"name": "Springfield", "country_code": "US"}]}
+    route = respx.get(GEOCODING_API_URL).mock(return_value=Response(200, json=payload))
+
+    cities = await search_city("Springfield")
+
+    assert [c.name for c in cities] == ["Springfield"]
+    assert route.call_count == 1
+
+
+def test_mapped_index_matches_in_memory(tmp_path):
+    index_path = tmp_path / "cities.idx"
+    assert build_index(read_geonames(CITIES_FILE), index_path) == 10
+
+    in_memory = Gazetteer.from_file(CITIES_FILE)
+    mapped = MappedGazetteer(index_path)
+    try:
+        assert len(mapped) == len(in_memory)
+        for query in ("Lon", "paris", "munc", "Muen", "M", "Vienna", "Atlantis"):
+            assert mapped.search(query, 5) == in_memory.search(query, 5)
+    finally:
+        mapped.close()
+
+
+def test_build_index_cli_and_load(tmp_path, capsys):
+    for name in ("cities15000.txt", "admin1CodesASCII.txt", "countryInfo.txt"):
+        (tmp_path / name).write_bytes((CITIES_FILE.parent / name).read_bytes())
+    source = tmp_path / "cities15000.txt"
+
+    assert geo_cli.main(["build-index", str(source)]) == 0
+    assert "Wrote 10 cities" in capsys.readouterr().out
+
+    loaded = load_gazetteer(tmp_path / "cities15000.idx")
+    try:
+        assert isinstance(loaded, MappedGazetteer)
+        assert loaded.search("Mos", 1)[0].country == "Russia"
+    finally:
+        loaded.close()
+    assert isinstance(load_gazetteer(source), Gazetteer)
+
+
+def test_city_index_subclasses_must_implement_storage():
+    class Partial(CityIndex):
+        def __len__(self) -> int:
+            return 0
+
+    with pytest.raises(TypeError, match="_record"):
+        Partial()
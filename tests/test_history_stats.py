@@ -4,6 +4,7 @@ import pytest
 from httpx import ASGITransport, AsyncClient
 
 from app.main import app
+from app.models.city_stats import CitySearchCount
 from app.models.search_history import SearchHistory
 from app.models.user import User
 
@@ -52,3 +53,76 @@ async def test_history_and_stats(db_session):
     stats = {item["city_name"]: item["count"] for item in resp.json()}
     assert stats["CityA"] == 2
     assert stats["CityB"] == 1
+
+
+@pytest.mark.asyncio
+async def test_stats_are_maintained_incrementally(db_session):
+    user = User(cookie_id="user-uuid-stats")
+    db_session.add(user)
+    await db_session.commit()
+
+    db_session.add(SearchHistory(user_id=user.id, city_name="CityZ"))
+    await db_session.commit()
+    db_session.add_all(
+        [
+            SearchHistory(user_id=user.id, city_name="CityZ"),
+            SearchHistory(user_id=user.id, city_name="CityY"),
+        ]
+    )
+    await db_session.commit()
+
+    global_count = await db_session.get(CitySearchCount, "CityZ")
+    await db_session.refresh(global_count)
+    assert global_count.search_count == 2
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app),
+        base_url="http://test",
+        cookies={"anon_uuid": user.cookie_id},
+    ) as client:
+        resp = await client.get("/api/user/stats")
+    assert resp.status_code == 200
+    stats = {item["city_name"]: item["count"] for item in resp.json()}
+    assert stats == {"CityZ": 2, "CityY": 1}
+
+
+@pytest.mark.asyncio
+async def test_history_keyset_pagination(db_session):
+    user = User(cookie_id="user-uuid-pages")
+    db_session.add(user)
+    await db_session.commit()
+
+    now = datetime.now(timezone.utc)
+    db_session.add_all(
+        [
+            SearchHistory(
+                user_id=user.id,
+                city_name=f"City{i}",
+                search_at=now - timedelta(minutes=i),
+            )
+            for i in range(5)
+        ]
+    )
+    await db_session.commit()
+
+    names = []
+    cursor = None
+    async with AsyncClient(
+        transport=ASGITransport(app=app),
+        base_url="http://test",
+        cookies={"anon_uuid": user.cookie_id},
+    ) as client:
+        for _ in range(3):
+            params = {"limit": 2}
+            if cursor:
+                params["cursor"] = cursor
+            resp = await client.get("/api/history", params=params)
+            assert resp.status_code == 200
+            names.extend(item["city_name"] for item in resp.json())
+            cursor = resp.headers.get("X-Next-Cursor")
+
+        assert cursor is None
+        assert names == [f"City{i}" for i in range(5)]
+
+        resp = await client.get("/api/history", params={"cursor": "not-a-cursor"})
+        assert resp.status_code == 400
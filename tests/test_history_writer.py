@@ -0,0 +1,98 @@
+import pytest
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+
+import app.services.history as history_mod
+from app.models.search_history import SearchHistory
+from app.models.user import User
+from app.services.history import HistoryWriter
+
+
+async def _make_user(db_session, cookie_id):
+    user = User(cookie_id=cookie_id)
+    db_session.add(user)
+    await db_session.commit()
+    return user
+
+
+async def _cities(db_session, user_id):
+    stmt = select(SearchHistory.city_name).filter_by(user_id=user_id)
+    return sorted((await db_session.execute(stmt)).scalars().all())
+
+
+@pytest.mark.asyncio
+async def test_history_writer_flushes_on_stop(db_session):
+    writer_user = await _make_user(db_session, "writer-uuid-1")
+    writer = HistoryWriter(batch_size=100, flush_interval=60, max_pending=10)
+    await writer.start()
+    for city in ("Oslo", "Bergen", "Oslo"):
+        await writer.record(writer_user.id, city)
+
+    assert await _cities(db_session, writer_user.id) == []
+    await writer.stop()
+
+    assert not writer.running
+    assert writer.flushed == 3
+    assert writer.batches == 1
+    assert await _cities(db_session, writer_user.id) == ["Bergen", "Oslo", "Oslo"]
+
+
+@pytest.mark.asyncio
+async def test_history_writer_flushes_full_batches(db_session):
+    writer_user = await _make_user(db_session, "writer-uuid-2")
+    writer = HistoryWriter(batch_size=2, flush_interval=60, max_pending=10)
+    await writer.start()
+    for city in ("A", "B", "C", "D", "E"):
+        await writer.record(writer_user.id, city)
+    await writer.stop()
+
+    assert writer.batches == 3
+    assert await _cities(db_session, writer_user.id) == ["A", "B", "C", "D", "E"]
+
+
+def _failing_sessions(monkeypatch, SessionLocal, failures: int):
+    """Make the writer's first ``failures`` sessions fail, as in an outage."""
+
+    def sessions():
+        nonlocal failures
+        if failures:
+            failures -= 1
+            raise OperationalError("INSERT", {}, ConnectionRefusedError())
+        return SessionLocal()
+
+    monkeypatch.setattr(history_mod, "AsyncSessionLocal", sessions)
+
+
+@pytest.mark.asyncio
+async def test_history_writer_retries_failed_batches(
+    db_session, monkeypatch, SessionLocal
+):
+    writer_user = await _make_user(db_session, "writer-uuid-3")
+    _failing_sessions(monkeypatch, SessionLocal, failures=2)
+    writer = HistoryWriter(
+        batch_size=100, flush_interval=60, max_pending=10, retries=2, retry_delay=0
+    )
+    await writer.start()
+    await writer.record(writer_user.id, "Oslo")
+    await writer.stop()
+
+    assert (writer.retried, writer.dropped, writer.flushed) == (2, 0, 1)
+    assert await _cities(db_session, writer_user.id) == ["Oslo"]
+
+
+@pytest.mark.asyncio
+async def test_history_writer_counts_dropped_rows(
+    db_session, monkeypatch, SessionLocal
+):
+    writer_user = await _make_user(db_session, "writer-uuid-4")
+    _failing_sessions(monkeypatch, SessionLocal, failures=3)
+    writer = HistoryWriter(
+        batch_size=100, flush_interval=60, max_pending=10, retries=2, retry_delay=0
+    )
+    await writer.start()
+    for city in ("Oslo", "Bergen"):
+        await writer.record(writer_user.id, city)
+    await writer.stop()
+
+    assert (writer.retried, writer.dropped, writer.flushed) == (2, 2, 0)
+    assert await _cities(db_session, writer_user.id) == []
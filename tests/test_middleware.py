@@ -0,0 +1,148 @@
+import pytest
+import respx
+from httpx import ASGITransport, AsyncClient, Response
+from sqlalchemy import func, select
+
+import app.middleware as middleware_mod
+import app.services.users as users_mod
+from app.main import app
+from app.models.search_history import SearchHistory
+from app.models.user import User
+from app.services.weather import FORECAST_API_URL, GEOCODING_API_URL
+
+
+@pytest.fixture
+def session_opens(monkeypatch, SessionLocal):
+    """
+    Count how many database sessions AuthMiddleware opens.
+    """
+    opened = []
+
+    def _counting_sessionmaker():
+        opened.append(1)
+        return SessionLocal()
+
+    monkeypatch.setattr(middleware_mod, "AsyncSessionLocal", _counting_sessionmaker)
+    return opened
+
+
+@pytest.mark.asyncio
+async def test_returning_visitor_is_resolved_from_cache(db_session, session_opens):
+    user = User(cookie_id="cached-uuid")
+    db_session.add(user)
+    await db_session.commit()
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app),
+        base_url="http://test",
+        cookies={"anon_uuid": user.cookie_id},
+    ) as client:
+        for _ in range(3):
+            resp = await client.get("/api/health")
+            assert resp.status_code == 200
+
+    assert len(session_opens) == 1
+
+
+@pytest.mark.asyncio
+async def test_new_visitor_gets_cookie_without_user_row(db_session, session_opens):
+    users_before = (await db_session.execute(select(func.count(User.id)))).scalar()
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        resp = await client.get("/")
+        assert resp.status_code == 200
+        assert "anon_uuid" in resp.cookies
+        # First visits leave nothing behind in the user cache.
+        assert len(users_mod.user_cache) == 0
+        assert session_opens == []
+
+        for _ in range(2):
+            resp = await client.get("/api/history")
+            assert resp.json() == []
+
+    users_after = (await db_session.execute(select(func.count(User.id)))).scalar()
+    assert users_after == users_before
+    # One lookup, then the unknown cookie is remembered briefly.
+    assert session_opens == [1]
+    assert len(users_mod.user_cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_unknown_cookie_is_rechecked_once_its_entry_expires(
+    db_session, monkeypatch
+):
+    monkeypatch.setattr(users_mod.unknown_cookies, "ttl", 0)
+    async with AsyncClient(
+        transport=ASGITransport(app=app),
+        base_url="http://test",
+        cookies={"anon_uuid": "other-worker-uuid"},
+    ) as client:
+        resp = await client.get("/api/user/stats")
+        assert resp.json() == []
+
+        # Another worker creates the row for this cookie.
+        user = User(cookie_id="other-worker-uuid")
+        db_session.add(user)
+        await db_session.commit()
+        db_session.add(SearchHistory(user_id=user.id, city_name="Tromso"))
+        await db_session.commit()
+
+        resp = await client.get("/api/history")
+        assert [item["city_name"] for item in resp.json()] == ["Tromso"]
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_user_row_created_on_first_history_write(db_session):
+    respx.get(GEOCODING_API_URL).mock(
+        return_value=Response(
+            200,
+            json={
+                "results": [{"name": "Lazyville", "latitude": 5.0, "longitude": 6.0}]
+            },
+        )
+    )
+    respx.get(FORECAST_API_URL).mock(
+        return_value=Response(
+            200,
+            json={
+                "latitude": 5.0,
+                "longitude": 6.0,
+                "generationtime_ms": 0.1,
+                "utc_offset_seconds": 0,
+                "timezone": "UTC",
+                "timezone_abbreviation": "UTC",
+                "hourly": {"time": [], "temperature_2m": [], "weathercode": []},
+            },
+        )
+    )
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        resp = await client.get("/api/weather", params={"city": "Lazyville"})
+        assert resp.status_code == 200
+        cookie = resp.cookies["anon_uuid"]
+
+        resp = await client.get("/api/history")
+        assert [h["city_name"] for h in resp.json()] == ["Lazyville"]
+
+    user = (
+        await db_session.execute(select(User).filter_by(cookie_id=cookie))
+    ).scalar_one()
+    assert user.id is not None
+
+
+@pytest.mark.asyncio
+async def test_new_visitor_cookie_attributes(db_session):
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        resp = await client.get("/api/health")
+    assert resp.json() == {"status": "ok"}
+    set_cookie = resp.headers["set-cookie"]
+    assert set_cookie.startswith("anon_uuid=")
+    assert "HttpOnly" in set_cookie
+    assert "Path=/" in set_cookie
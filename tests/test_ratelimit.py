@@ -0,0 +1,91 @@
+import asyncio
+import time
+
+import pytest
+
+from app.services.ratelimit import AdaptiveLimiter, LimiterTimeout
+from tests.test_cache import FakeClock
+
+
+@pytest.mark.asyncio
+async def test_limiter_caps_concurrent_calls():
+    limiter = AdaptiveLimiter(
+        rate=1000, burst=100, max_concurrency=2, queue_timeout=1.0
+    )
+    peak = 0
+
+    async def call():
+        nonlocal peak
+        await limiter.acquire()
+        try:
+            peak = max(peak, limiter.in_flight)
+            await asyncio.sleep(0.01)
+        finally:
+            limiter.release()
+
+    await asyncio.gather(*(call() for _ in range(6)))
+    assert peak == 2
+    assert limiter.state().admitted == 6
+    assert limiter.in_flight == limiter.waiting == 0
+
+
+@pytest.mark.asyncio
+async def test_limiter_paces_calls_to_its_rate():
+    limiter = AdaptiveLimiter(rate=50, burst=1, max_concurrency=10, queue_timeout=1.0)
+    started = time.monotonic()
+    for _ in range(4):
+        await limiter.acquire()
+        limiter.release()
+    # One token up front, then one every 20ms
+    assert time.monotonic() - started >= 0.05
+
+
+@pytest.mark.asyncio
+async def test_limiter_rejects_calls_that_would_miss_their_deadline():
+    limiter = AdaptiveLimiter(
+        rate=1000, burst=100, max_concurrency=1, queue_timeout=0.05
+    )
+    await limiter.acquire()
+    with pytest.raises(LimiterTimeout) as excinfo:
+        await limiter.acquire()
+    assert excinfo.value.retry_after is None
+    assert limiter.state().rejected == 1
+
+    limiter.release()
+    limiter.on_throttle(retry_after=30)
+    started = time.monotonic()
+    with pytest.raises(LimiterTimeout) as excinfo:
+        await limiter.acquire()
+    # Known to be too long a wait, so it fails without queueing.
+    assert time.monotonic() - started < 0.05
+    assert excinfo.value.retry_after == pytest.approx(30, abs=0.5)
+
+
+def test_limiter_adjusts_rate_additively_up_and_multiplicatively_down():
+    clock = FakeClock()
+    limiter = AdaptiveLimiter(
+        rate=10,
+        burst=5,
+        max_concurrency=5,
+        queue_timeout=1.0,
+        min_rate=2,
+        increase=1,
+        backoff=0.5,
+        max_pause=10,
+        clock=clock,
+    )
+    limiter.on_throttle(retry_after=120)
+    limiter.on_throttle()
+    limiter.on_throttle()
+    state = limiter.state()
+    assert state.rate == 2
+    assert state.tokens == 0
+    assert state.paused_for == 10
+    assert state.throttled == 3
+
+    for _ in range(20):
+        limiter.on_success()
+    assert limiter.rate == 10
+
+    clock.now = 1
+    assert limiter.state().tokens == 5
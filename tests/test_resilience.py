@@ -0,0 +1,58 @@
+import random
+
+from app.services.resilience import CircuitBreaker, LatencyTracker, decorrelated_jitter
+from tests.test_cache import FakeClock
+
+
+def test_decorrelated_jitter_stays_within_bounds():
+    random.seed(7)
+    delay = 0.1
+    for _ in range(50):
+        previous, delay = delay, decorrelated_jitter(delay, base=0.1, cap=2.0)
+        assert 0.1 <= delay <= min(2.0, previous * 3)
+    assert delay > 0.3
+
+
+def test_latency_tracker_quantile_needs_min_samples():
+    tracker = LatencyTracker(window=100, min_samples=10)
+    for ms in range(1, 10):
+        tracker.record(ms / 1000)
+    assert tracker.quantile(0.95) is None
+
+    for ms in range(10, 101):
+        tracker.record(ms / 1000)
+    assert tracker.quantile(0.95) == 0.096
+    assert tracker.quantile(0.5) == 0.051
+
+    # Only the last `window` samples count.
+    for _ in range(100):
+        tracker.record(1.0)
+    assert tracker.quantile(0.5) == 1.0
+
+
+def test_circuit_breaker_opens_and_recovers_through_a_trial_call():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30, clock=clock)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+    assert breaker.retry_after == 30
+
+    clock.now = 30
+    assert breaker.state == "half-open"
+    assert breaker.allow()
+    # Only one trial at a time
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    clock.now = 60
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow()
+    assert breaker.opened == 1
+    assert breaker.rejected == 2
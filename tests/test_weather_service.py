@@ -1,17 +1,27 @@
+import asyncio
+import gc
+
 import httpx
 import pytest
 import respx
 from httpx import Response
 
+import app.services.weather as weather_mod
 from app.schemas.weather import City, ForecastResponse
+from app.services.cache import TTLCache
 from app.services.weather import (
     FORECAST_API_URL,
     GEOCODING_API_URL,
+    UpstreamRateLimitError,
+    UpstreamUnavailableError,
     WeatherServiceError,
     fetch_weather_by_city,
     get_forecast,
+    load_forecasts,
+    load_weather_batch,
     search_city,
 )
+from tests.test_cache import FakeClock
 
 
 @pytest.mark.asyncio
@@ -174,3 +184,502 @@ async def test_fetch_weather_by_city_geocoding_error():
 
     with pytest.raises(WeatherServiceError):
         await fetch_weather_by_city("ErrorTown")
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_search_city_reuses_injected_client():
+    respx.get(GEOCODING_API_URL).mock(return_value=Response(200, json={"results": []}))
+
+    async with httpx.AsyncClient() as client:
+        assert await search_city("Nowhere", client=client) == []
+        assert await search_city("Nowhere", client=client) == []
+        assert not client.is_closed
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_get_forecast_served_from_cache_for_nearby_coordinates():
+    mock_payload = {
+        "latitude": 55.75,
+        "longitude": 37.61,
+        "generationtime_ms": 1.0,
+        "utc_offset_seconds": 0,
+        "timezone": "UTC",
+        "timezone_abbreviation": "UTC",
+        "elevation": 100.0,
+        "hourly": {
+            "time": ["2023-10-01T00:00:00Z"],
+            "temperature_2m": [15.0],
+            "weathercode": [0],
+        },
+    }
+    route = respx.get(FORECAST_API_URL).mock(
+        return_value=Response(200, json=mock_payload)
+    )
+
+    first = await get_forecast(55.7512, 37.6101)
+    second = await get_forecast(55.7514, 37.6099)
+    assert route.call_count == 1
+    assert second is first
+    assert weather_mod.forecast_cache.stats.hits == 1
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_get_forecast_errors_are_not_cached():
+    route = respx.get(FORECAST_API_URL).mock(return_value=Response(503, text="busy"))
+
+    for _ in range(2):
+        with pytest.raises(WeatherServiceError):
+            await get_forecast(1.0, 2.0)
+    # Each call retries the 503 before giving up
+    assert route.call_count == 2 * (weather_mod.settings.upstream_retries + 1)
+
+
+def _city(name: str) -> dict:
+    return {"name": name, "latitude": 1.0, "longitude": 2.0, "timezone": "UTC"}
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_search_city_reuses_complete_prefix_results():
+    route = respx.get(GEOCODING_API_URL).mock(
+        return_value=Response(200, json={"results": [_city("London"), _city("Lonoke")]})
+    )
+
+    await search_city("Lon")
+    cities = await search_city("  LOND ")
+    assert route.call_count == 1
+    assert [c.name for c in cities] == ["London"]
+    assert weather_mod.geocoding_cache.prefix_hits == 1
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_search_city_does_not_reuse_truncated_prefix_results():
+    route = respx.get(GEOCODING_API_URL).mock(
+        return_value=Response(200, json={"results": [_city("London"), _city("Lonoke")]})
+    )
+
+    await search_city("Lon", max_results=2)
+    await search_city("Lond", max_results=2)
+    await search_city("Lo")
+    await search_city("Lon", max_results=1)
+    assert route.call_count == 3
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_concurrent_forecasts_are_coalesced():
+    payload = {
+        "latitude": 1.0,
+        "longitude": 2.0,
+        "generationtime_ms": 1.0,
+        "utc_offset_seconds": 0,
+        "timezone": "UTC",
+        "timezone_abbreviation": "UTC",
+        "hourly": {"time": [], "temperature_2m": [], "weathercode": []},
+    }
+
+    async def slow_forecast(request):
+        await asyncio.sleep(0.05)
+        return Response(200, json=payload)
+
+    route = respx.get(FORECAST_API_URL).mock(side_effect=slow_forecast)
+    coalesced_before = weather_mod.upstream_flights.coalesced
+
+    results = await asyncio.gather(*(get_forecast(1.0, 2.0) for _ in range(5)))
+    assert route.call_count == 1
+    assert all(r is results[0] for r in results)
+    assert weather_mod.upstream_flights.coalesced - coalesced_before == 4
+    assert len(weather_mod.upstream_flights) == 0
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_concurrent_geocoding_failure_fans_out_to_all_waiters():
+    async def slow_failure(request):
+        await asyncio.sleep(0.05)
+        return Response(500, text="Oops")
+
+    route = respx.get(GEOCODING_API_URL).mock(side_effect=slow_failure)
+
+    results = await asyncio.gather(
+        *(search_city("Paris") for _ in range(3)), return_exceptions=True
+    )
+    assert route.call_count == 1
+    assert all(isinstance(r, WeatherServiceError) for r in results)
+    assert all("Oops" in str(r) for r in results)
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_cancellable_lookup_is_aborted_once_nobody_waits():
+    started = asyncio.Event()
+    release = asyncio.Event()
+    aborted = []
+
+    async def slow_geocoding(request):
+        started.set()
+        try:
+            await release.wait()
+        except asyncio.CancelledError:
+            aborted.append(request.url.params["name"])
+            raise
+        return Response(200, json={"results": []})
+
+    respx.get(GEOCODING_API_URL).mock(side_effect=slow_geocoding)
+    abandoned = weather_mod.upstream_flights.abandoned
+
+    # A waiter that wants the result keeps the call alive for everyone.
+    keep = asyncio.ensure_future(search_city("Oslo"))
+    drop = asyncio.ensure_future(search_city("Oslo", cancellable=True))
+    await started.wait()
+    drop.cancel()
+    keep.cancel()
+    await asyncio.sleep(0.01)
+    assert aborted == []
+
+    started.clear()
+    lookups = [
+        asyncio.ensure_future(search_city("Bergen", cancellable=True)) for _ in range(2)
+    ]
+    await started.wait()
+    lookups[0].cancel()
+    await asyncio.sleep(0.01)
+    assert aborted == []
+    lookups[1].cancel()
+    await asyncio.sleep(0.01)
+    assert aborted == ["Bergen"]
+    assert weather_mod.upstream_flights.abandoned == abandoned + 1
+
+    release.set()
+    while len(weather_mod.upstream_flights):
+        await asyncio.sleep(0.01)
+    assert aborted == ["Bergen"]
+
+
+def _forecast_payload(temperature: float) -> dict:
+    return {
+        "latitude": 1.0,
+        "longitude": 2.0,
+        "generationtime_ms": 1.0,
+        "utc_offset_seconds": 0,
+        "timezone": "UTC",
+        "timezone_abbreviation": "UTC",
+        "hourly": {
+            "time": ["2025-05-26T00:00:00Z"],
+            "temperature_2m": [temperature],
+            "weathercode": [0],
+        },
+    }
+
+
+@pytest.fixture
+def swr_cache(monkeypatch):
+    clock = FakeClock()
+    cache = TTLCache(maxsize=10, ttl=60, stale_ttl=300, clock=clock)
+    monkeypatch.setattr(weather_mod, "forecast_cache", cache)
+    return clock
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_get_forecast_serves_stale_while_revalidating(swr_cache):
+    route = respx.get(FORECAST_API_URL).mock(
+        return_value=Response(200, json=_forecast_payload(15.0))
+    )
+    await get_forecast(1.0, 2.0)
+
+    swr_cache.now = 120
+    route.mock(return_value=Response(200, json=_forecast_payload(16.0)))
+    stale = await get_forecast(1.0, 2.0)
+    assert stale.hourly.temperature_2m == [15.0]
+
+    await asyncio.gather(*weather_mod._refresh_tasks)
+    fresh = await get_forecast(1.0, 2.0)
+    assert fresh.hourly.temperature_2m == [16.0]
+    assert route.call_count == 2
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_get_forecast_stale_entry_survives_upstream_errors(swr_cache):
+    route = respx.get(FORECAST_API_URL).mock(
+        return_value=Response(200, json=_forecast_payload(15.0))
+    )
+    await get_forecast(1.0, 2.0)
+
+    swr_cache.now = 120
+    route.mock(return_value=Response(500, text="down"))
+    stale = await get_forecast(1.0, 2.0)
+    await asyncio.gather(*weather_mod._refresh_tasks)
+    assert stale.hourly.temperature_2m == [15.0]
+
+    swr_cache.now = 1000
+    with pytest.raises(WeatherServiceError):
+        await get_forecast(1.0, 2.0)
+
+
+def _multi_location_response(request):
+    lats = request.url.params["latitude"].split(",")
+    payloads = [_forecast_payload(float(lat)) for lat in lats]
+    return Response(200, json=payloads[0] if len(payloads) == 1 else payloads)
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_load_forecasts_uses_multi_location_requests(monkeypatch):
+    monkeypatch.setattr(weather_mod.settings, "forecast_batch_locations", 3)
+    route = respx.get(FORECAST_API_URL).mock(side_effect=_multi_location_response)
+    await get_forecast(1.0, 1.0)
+
+    coords = [(float(i), float(i)) for i in range(1, 8)] + [(2.001, 2.0)]
+    forecasts = await load_forecasts(coords)
+
+    assert [f.temperatures[0] for f in forecasts] == [1, 2, 3, 4, 5, 6, 7, 2]
+    assert forecasts[-1] is forecasts[1]
+    # One cached, six fetched three per request
+    assert route.call_count == 3
+    assert route.calls[1].request.url.params["latitude"] == "2.0,3.0,4.0"
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_load_forecasts_reports_failed_requests_per_location(monkeypatch):
+    monkeypatch.setattr(weather_mod.settings, "forecast_batch_locations", 2)
+
+    def flaky(request):
+        if request.url.params["latitude"].startswith("3.0"):
+            return Response(500, text="down")
+        return _multi_location_response(request)
+
+    respx.get(FORECAST_API_URL).mock(side_effect=flaky)
+    forecasts = await load_forecasts([(1.0, 1.0), (2.0, 2.0), (3.0, 3.0), (4.0, 4.0)])
+
+    assert [f.temperatures[0] for f in forecasts[:2]] == [1, 2]
+    assert all(isinstance(f, WeatherServiceError) for f in forecasts[2:])
+    assert str(forecasts[2]) == "down"
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_batches_and_single_fetches_share_upstream_calls():
+    async def slow(request):
+        await asyncio.sleep(0.05)
+        return _multi_location_response(request)
+
+    route = respx.get(FORECAST_API_URL).mock(side_effect=slow)
+    first, single, overlapping = await asyncio.gather(
+        load_forecasts([(1.0, 1.0), (2.0, 2.0)]),
+        get_forecast(2.0, 2.0),
+        load_forecasts([(2.0, 2.0), (3.0, 3.0)]),
+    )
+
+    # The single fetch and the second batch join the first batch's call for
+    # (2, 2); only (3, 3) needs another request.
+    assert route.call_count == 2
+    assert route.calls[1].request.url.params["latitude"] == "3.0"
+    assert overlapping[0] is first[1]
+    assert single.hourly.temperature_2m[0] == 2
+    assert len(weather_mod.upstream_flights) == 0
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_load_weather_batch_mixes_names_coordinates_and_errors():
+    def geocoding(request):
+        name = request.url.params["name"]
+        if name == "Nowhere":
+            return Response(200, json={"results": []})
+        city = {"name": name, "latitude": 5.0, "longitude": 5.0}
+        return Response(200, json={"results": [city]})
+
+    geocode = respx.get(GEOCODING_API_URL).mock(side_effect=geocoding)
+    forecast = respx.get(FORECAST_API_URL).mock(side_effect=_multi_location_response)
+
+    results = await load_weather_batch(["Paris", (1.0, 1.0), "Nowhere", "Paris"])
+
+    assert [r.city and r.city.name for r in results] == ["Paris", None, None, "Paris"]
+    assert results[0].forecast is results[3].forecast
+    assert results[1].forecast.temperatures[0] == 1.0
+    assert results[2].error == "No matching city for 'Nowhere'"
+    assert geocode.call_count == 2
+    assert forecast.call_count == 1
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_rate_limited_responses_slow_down_the_limiter(upstream_limiter):
+    respx.get(GEOCODING_API_URL).mock(
+        return_value=Response(429, headers={"Retry-After": "7"}, json={})
+    )
+    with pytest.raises(UpstreamRateLimitError) as excinfo:
+        await search_city("Paris")
+
+    assert excinfo.value.retry_after == 7
+    state = upstream_limiter.state()
+    assert state.throttled == 1
+    assert state.rate == 500
+    assert state.paused_for == pytest.approx(7, abs=0.5)
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_calls_fail_fast_while_the_limiter_is_paused(upstream_limiter):
+    route = respx.get(FORECAST_API_URL).mock(
+        return_value=Response(200, json=_forecast_payload(15.0))
+    )
+    upstream_limiter.on_throttle(retry_after=30)
+
+    with pytest.raises(UpstreamRateLimitError) as excinfo:
+        await get_forecast(1.0, 2.0)
+    assert "busy" in str(excinfo.value)
+    assert excinfo.value.retry_after == pytest.approx(30, abs=0.5)
+    assert not route.called
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_gateway_errors_and_network_errors_are_retried():
+    route = respx.get(FORECAST_API_URL).mock(
+        side_effect=[
+            Response(503, text="busy"),
+            httpx.ConnectError("reset"),
+            Response(200, json=_forecast_payload(15.0)),
+        ]
+    )
+    forecast = await get_forecast(1.0, 2.0)
+
+    assert forecast.hourly.temperature_2m == [15.0]
+    assert route.call_count == 3
+    assert weather_mod.upstream_stats.retries == 2
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_client_errors_are_not_retried():
+    route = respx.get(FORECAST_API_URL).mock(
+        return_value=Response(400, json={"reason": "bad"})
+    )
+    with pytest.raises(WeatherServiceError):
+        await get_forecast(1.0, 2.0)
+    assert route.call_count == 1
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_slow_requests_are_hedged():
+    for _ in range(weather_mod.settings.upstream_hedge_min_samples):
+        weather_mod.upstream_latency["Forecast"].record(0.01)
+    calls = 0
+
+    async def first_slow(request):
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            await asyncio.sleep(5)
+        return Response(200, json=_forecast_payload(float(calls)))
+
+    respx.get(FORECAST_API_URL).mock(side_effect=first_slow)
+    forecast = await asyncio.wait_for(get_forecast(1.0, 2.0), timeout=1)
+
+    assert forecast.hourly.temperature_2m == [2.0]
+    assert weather_mod.upstream_stats.hedges == 1
+    assert weather_mod.upstream_stats.hedge_wins == 1
+    assert weather_mod.upstream_limiter.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_losing_hedge_is_awaited(monkeypatch):
+    for _ in range(weather_mod.settings.upstream_hedge_min_samples):
+        weather_mod.upstream_latency["Forecast"].record(0.01)
+    unretrieved = []
+    loop = asyncio.get_running_loop()
+    loop.set_exception_handler(lambda _, context: unretrieved.append(context))
+    hedge_started = asyncio.Event()
+
+    async def primary(*args):
+        await hedge_started.wait()
+        return Response(200)
+
+    async def hedge(*args):
+        hedge_started.set()
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            # E.g. a transport failing while it tears the request down
+            await asyncio.sleep(0)
+            raise httpx.ReadError("connection reset")
+
+    monkeypatch.setattr(weather_mod, "_limited_get", primary)
+    monkeypatch.setattr(weather_mod, "_send", hedge)
+    try:
+        resp = await weather_mod._hedged_get(None, FORECAST_API_URL, {}, "Forecast")
+        assert resp.status_code == 200
+        # The loser has finished, and its slot is back, before the call returns.
+        assert weather_mod.upstream_limiter.in_flight == 0
+        await asyncio.sleep(0.01)
+        gc.collect()
+    finally:
+        loop.set_exception_handler(None)
+    assert unretrieved == []
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_open_circuit_fails_fast_and_serves_stale_geocoding(monkeypatch):
+    monkeypatch.setattr(weather_mod.geocoding_cache._cache, "ttl", -1)
+    route = respx.get(GEOCODING_API_URL).mock(
+        return_value=Response(200, json={"results": [_city("Paris")]})
+    )
+    await search_city("Paris")
+
+    route.mock(side_effect=httpx.ConnectError("down"))
+    threshold = weather_mod.settings.upstream_breaker_threshold
+    for i in range(threshold):
+        with pytest.raises(WeatherServiceError):
+            await search_city(f"Nowhere {i}")
+    assert weather_mod.upstream_breakers["Geocoding"].state == "open"
+    calls = route.call_count
+
+    with pytest.raises(UpstreamUnavailableError):
+        await search_city("Lyon")
+    cities = await search_city("Paris")
+    assert [c.name for c in cities] == ["Paris"]
+    assert route.call_count == calls
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_open_circuit_serves_stale_forecasts(swr_cache):
+    route = respx.get(FORECAST_API_URL).mock(
+        return_value=Response(200, json=_forecast_payload(15.0))
+    )
+    await get_forecast(1.0, 2.0)
+    for _ in range(weather_mod.settings.upstream_breaker_threshold):
+        weather_mod.upstream_breakers["Forecast"].record_failure()
+
+    swr_cache.now = 120
+    stale = await get_forecast(1.0, 2.0)
+    await asyncio.gather(*weather_mod._refresh_tasks)
+    assert stale.hourly.temperature_2m == [15.0]
+    assert route.call_count == 1
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_repeated_server_errors_open_the_circuit():
+    route = respx.get(FORECAST_API_URL).mock(return_value=Response(500, text="boom"))
+    threshold = weather_mod.settings.upstream_breaker_threshold
+    for i in range(threshold):
+        with pytest.raises(WeatherServiceError, match="boom"):
+            await get_forecast(float(i), 0.0)
+    # 500 is not retried, but it does count against the breaker.
+    assert route.call_count == threshold
+    assert weather_mod.upstream_breakers["Forecast"].state == "open"
+
+    with pytest.raises(UpstreamUnavailableError):
+        await get_forecast(50.0, 0.0)
+    assert route.call_count == threshold
@@ -5,6 +5,7 @@ import respx
 from httpx import ASGITransport, AsyncClient, Response
 from sqlalchemy import select
 
+import app.routers.web as web_mod
 from app.main import app
 from app.models.search_history import SearchHistory
 from app.models.user import User
@@ -131,3 +132,79 @@ async def test_post_weather_logs_and_renders(db_session):
     records = result.scalars().all()
     assert len(records) == 1
     assert records[0].city_name == "Testville"
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_forecast_table_fragment_is_shared_between_users(db_session):
+    respx.get(GEOCODING_API_URL).mock(
+        return_value=Response(
+            200,
+            json={
+                "results": [
+                    {
+                        "name": "Fragmentville",
+                        "latitude": 3.0,
+                        "longitude": 4.0,
+                        "timezone": "UTC",
+                    }
+                ]
+            },
+        )
+    )
+    respx.get(FORECAST_API_URL).mock(
+        return_value=Response(
+            200,
+            json={
+                "latitude": 3.0,
+                "longitude": 4.0,
+                "generationtime_ms": 0.1,
+                "utc_offset_seconds": 0,
+                "timezone": "UTC",
+                "timezone_abbreviation": "UTC",
+                "hourly": {
+                    "time": [1748217600],
+                    "temperature_2m": [21.5],
+                    "weathercode": [0],
+                },
+            },
+        )
+    )
+    hits_before = web_mod.forecast_fragments.stats.hits
+
+    pages = []
+    for cookie in ("frag-user-1", "frag-user-2"):
+        async with AsyncClient(
+            transport=ASGITransport(app=app),
+            base_url="http://test",
+            cookies={"anon_uuid": cookie},
+        ) as client:
+            resp = await client.post("/weather", data={"city": "Fragmentville"})
+        assert resp.status_code == 200
+        pages.append(resp.text)
+
+    assert web_mod.forecast_fragments.stats.hits - hits_before == 1
+    for html in pages:
+        assert "Forecast for Fragmentville" in html
+        assert "21.5°C" in html
+        assert "<tbody>" in html and "&lt;" not in html
+
+
+@pytest.mark.asyncio
+async def test_static_assets_are_served_with_etags():
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        page = await client.get("/")
+        assert '<link rel="stylesheet" href="/static/css/skyscan.css"/>' in page.text
+        assert '<script src="/static/js/suggest.js"></script>' in page.text
+
+        resp = await client.get("/static/js/suggest.js")
+        assert resp.status_code == 200
+        assert "fetchSuggestions" in resp.text
+        etag = resp.headers["etag"]
+
+        resp = await client.get(
+            "/static/js/suggest.js", headers={"If-None-Match": etag}
+        )
+        assert resp.status_code == 304